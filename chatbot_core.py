@@ -0,0 +1,447 @@
+"""
+Gemini RAG chatbot shared by the Colab scripts and the Streamlit app
+"""
+import functools
+import os
+import logging
+import traceback
+import google.generativeai as genai
+from dotenv import load_dotenv
+
+from colab_utils import (
+    GENERATION_MODEL,
+    SIMILARITY_TOP_K,
+    QueryCache,
+    create_text_splitter,
+    create_vector_store,
+    data_signature,
+    diff_manifest,
+    get_generative_model,
+    load_manifest,
+    open_vector_db,
+    resolve_llama_index,
+    save_manifest,
+    scan_data_dir,
+    update_manifest,
+)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+# Directory paths
+DATA_DIR = "./data"
+CHROMA_DB_DIRECTORY = "./chroma_db"
+
+# Resolve LlamaIndex classes once per process instead of on every build
+LLAMA_INDEX_CLASSES, LLAMA_INDEX_PATHS = resolve_llama_index(CHROMA_DB_DIRECTORY)
+_VectorStoreIndex = LLAMA_INDEX_CLASSES["VectorStoreIndex"]
+_SimpleDirectoryReader = LLAMA_INDEX_CLASSES["SimpleDirectoryReader"]
+_SentenceSplitter = LLAMA_INDEX_CLASSES["SentenceSplitter"]
+_ChromaVectorStore = LLAMA_INDEX_CLASSES["ChromaVectorStore"]
+_Gemini = LLAMA_INDEX_CLASSES["Gemini"]
+
+# Upper bound on the processes used to parse documents
+MAX_READER_WORKERS = 8
+
+# Index state shared by every chatbot in the process, keyed by database directory
+_SHARED_INDEXES = {}
+
+@functools.lru_cache(maxsize=None)
+def get_answer_llm(api_key, model_name=GENERATION_MODEL):
+    """
+    Create the LlamaIndex Gemini LLM that writes answers, once per process
+
+    Returns:
+        Gemini LLM, or None when llama-index-llms-gemini isn't installed
+    """
+    if _Gemini is None:
+        logger.warning("llama-index-llms-gemini not installed; answering with LlamaIndex's default LLM")
+        return None
+    return _Gemini(model=f"models/{model_name}", api_key=api_key)
+
+# Written to an empty data directory when create_sample_document is set
+SAMPLE_FAQ = (
+    "# Sample FAQ\n\n"
+    "## What is this chatbot?\n"
+    "This is a RAG-based chatbot using Google Gemini API.\n\n"
+    "## What is RAG?\n"
+    "RAG stands for Retrieval-Augmented Generation, which enhances LLM responses with retrieved information.\n\n"
+    "## How does it work?\n"
+    "It uses vector embeddings to find relevant information and then generates responses based on that information.\n"
+)
+
+class GeminiChatbot:
+    # Create a sample FAQ instead of failing when the data directory is empty
+    create_sample_document = False
+
+    def __init__(self):
+        # Get Gemini API key
+        self.api_key = self._get_api_key()
+
+        # Configure Gemini
+        self._configure_gemini(self.api_key)
+        self.model = get_generative_model()
+        self.index = None
+        self.query_cache = QueryCache()
+        self.chroma_collection = None
+        self.quantized_index = None
+        self.corpus_version = None
+        self.similarity_top_k = SIMILARITY_TOP_K
+        self.allowed_files = None
+
+    def _get_api_key(self):
+        """Read the Gemini API key from the environment, prompting for it if missing"""
+        api_key = os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            print("GEMINI_API_KEY not found in environment. Please set it first.")
+            api_key = input("Enter your Gemini API key: ")
+            os.environ["GEMINI_API_KEY"] = api_key
+        return api_key
+
+    def _configure_gemini(self, api_key):
+        """Configure the Gemini client"""
+        genai.configure(api_key=api_key)
+
+    def _log_info(self, message):
+        """Report progress to the user"""
+        print(message)
+
+    def _log_error(self, message):
+        """Report an error to the user"""
+        print(message)
+
+    def load_documents(self):
+        """Load documents from the data directory"""
+        if not os.path.exists(DATA_DIR):
+            os.makedirs(DATA_DIR)
+            self._log_info(f"Created data directory at {DATA_DIR}")
+
+        if not os.listdir(DATA_DIR):
+            self._log_info("Data directory is empty. Please add some documents.")
+            if not self.create_sample_document:
+                return False
+
+            # Create sample document for testing
+            sample_path = os.path.join(DATA_DIR, "sample_faq.md")
+            try:
+                with open(sample_path, "w") as f:
+                    f.write(SAMPLE_FAQ)
+                self._log_info(f"Created sample FAQ document at {sample_path}")
+            except Exception as e:
+                self._log_error(f"Error creating sample document: {str(e)}")
+                return False
+
+        return True
+
+    def _quantize_collection(self, chroma_collection):
+        """Quantize the stored embeddings to int8, falling back to float search on failure"""
+        try:
+            from colab_quantization import Int8VectorIndex
+            return Int8VectorIndex.from_collection(chroma_collection)
+        except Exception as e:
+            self._log_info(f"Int8 retrieval unavailable, using float search: {str(e)}")
+            return None
+
+    def _read_documents(self, files):
+        """Parse documents, spreading the files over a process pool when there are several"""
+        reader = _SimpleDirectoryReader(input_files=files)
+        num_workers = min(MAX_READER_WORKERS, os.cpu_count() or 1, len(files))
+        if num_workers > 1:
+            try:
+                return reader.load_data(num_workers=num_workers)
+            except TypeError:
+                # Older llama-index versions only read serially
+                pass
+        return reader.load_data()
+
+    def _sync_index(self, data_sig, rebuild=False):
+        """
+        Attach to the persisted collection and re-embed only new or changed files
+
+        Args:
+            data_sig: Signature of the data directory (see colab_utils.data_signature)
+            rebuild: Drop the stored embeddings and index every document again
+
+        Returns:
+            tuple: (chroma_collection, index, corpus_version)
+        """
+        missing = [name for name, cls in LLAMA_INDEX_CLASSES.items() if cls is None and name != "Gemini"]
+        if missing:
+            raise ImportError(f"LlamaIndex components not found: {missing}. Please install llama-index.")
+        from colab_embeddings import BatchedGeminiEmbedding
+
+        # Set up Chroma client
+        if not os.path.exists(CHROMA_DB_DIRECTORY):
+            os.makedirs(CHROMA_DB_DIRECTORY)
+
+        chroma_client = open_vector_db(CHROMA_DB_DIRECTORY)
+        chroma_collection = chroma_client.get_or_create_collection("documents")
+        stored = chroma_collection.metadata or {}
+        corpus_version = int(stored.get("corpus_version", 0))
+        manifest = {} if rebuild else load_manifest(CHROMA_DB_DIRECTORY)
+
+        # Start from an empty collection when rebuilding or when embeddings can't be matched to files
+        if not manifest and chroma_collection.count() > 0:
+            chroma_client.delete_collection("documents")
+            chroma_collection = chroma_client.get_or_create_collection("documents")
+
+        vector_store = create_vector_store(chroma_collection, _ChromaVectorStore)
+        try:
+            index = _VectorStoreIndex.from_vector_store(
+                vector_store,
+                embed_model=BatchedGeminiEmbedding(),
+                insert_batch_size=5000,
+            )
+        except TypeError:
+            # Older versions configure the embedding model through the service context
+            index = _VectorStoreIndex.from_vector_store(vector_store)
+
+        # Reuse the persisted embeddings when the documents haven't changed
+        if manifest and stored.get("data_sig") == data_sig:
+            return chroma_collection, index, corpus_version
+
+        # Only read and embed files that are new or changed since the last build
+        current_hashes = scan_data_dir(DATA_DIR)
+        changed_files, stale_node_ids = diff_manifest(manifest, current_hashes)
+        if stale_node_ids:
+            chroma_collection.delete(ids=stale_node_ids)
+
+        nodes = []
+        if changed_files:
+            self._log_info(f"Indexing {len(changed_files)} new or changed documents")
+            documents = self._read_documents(changed_files)
+
+            # Create ~512-token chunker for text chunking
+            text_splitter = create_text_splitter(_SentenceSplitter)
+            nodes = text_splitter.get_nodes_from_documents(documents)
+            index.insert_nodes(nodes)
+
+        save_manifest(CHROMA_DB_DIRECTORY, update_manifest(manifest, current_hashes, nodes))
+
+        # Bump the version only when the stored embeddings changed, not when files were just touched
+        if not manifest or changed_files or stale_node_ids:
+            corpus_version += 1
+
+        # Remember which documents the stored embeddings belong to
+        chroma_collection.modify(metadata={"data_sig": data_sig, "corpus_version": corpus_version})
+        return chroma_collection, index, corpus_version
+
+    def _attach_shared_index(self):
+        """Use the index most recently built in this process, e.g. by another chatbot"""
+        shared = _SHARED_INDEXES.get(CHROMA_DB_DIRECTORY)
+        if shared is None or shared["index"] is self.index:
+            return
+        self.chroma_collection = shared["chroma_collection"]
+        self.index = shared["index"]
+        self.quantized_index = shared["quantized_index"]
+        if shared["corpus_version"] != self.corpus_version:
+            self.corpus_version = shared["corpus_version"]
+            # Cached answers came from different documents
+            self.query_cache.clear()
+
+    def build_index(self, rebuild=False):
+        """
+        Build the vector index, or reuse the one already built in this process
+
+        Args:
+            rebuild: Drop the stored embeddings and index every document again
+        """
+        try:
+            data_sig = data_signature(DATA_DIR)
+            shared = _SHARED_INDEXES.get(CHROMA_DB_DIRECTORY)
+            if rebuild or shared is None or shared["data_sig"] != data_sig:
+                chroma_collection, index, corpus_version = self._sync_index(data_sig, rebuild)
+
+                # Keep an int8 copy of the embeddings for the coarse similarity scan
+                shared = {
+                    "data_sig": data_sig,
+                    "chroma_collection": chroma_collection,
+                    "index": index,
+                    "corpus_version": corpus_version,
+                    "quantized_index": self._quantize_collection(chroma_collection),
+                }
+                _SHARED_INDEXES[CHROMA_DB_DIRECTORY] = shared
+
+            self._attach_shared_index()
+            self._log_info("Index built successfully!")
+            return True
+        except Exception as e:
+            self._log_error(f"Error building index: {str(e)}")
+            traceback.print_exc()
+            return False
+
+    def set_retrieval_options(self, similarity_top_k=SIMILARITY_TOP_K, allowed_files=None):
+        """
+        Set how many chunks are retrieved per query and which documents they may come from
+
+        Args:
+            similarity_top_k: Number of chunks to retrieve
+            allowed_files: File names to restrict retrieval to, or None for all documents
+        """
+        allowed_files = sorted(allowed_files) if allowed_files else None
+        if (similarity_top_k, allowed_files) != (self.similarity_top_k, self.allowed_files):
+            self.similarity_top_k = similarity_top_k
+            self.allowed_files = allowed_files
+            # Cached answers were retrieved with the previous options
+            self.query_cache.clear()
+
+    def _create_query_engine(self, **kwargs):
+        """Create a query engine, retrieving through the int8 codes when available"""
+        llm = get_answer_llm(self.api_key)
+        if llm is not None:
+            kwargs["llm"] = llm
+        # Filter on document metadata inside the vector store, before the similarity scan
+        where = {"file_name": {"$in": self.allowed_files}} if self.allowed_files else None
+        if self.quantized_index is not None:
+            from colab_quantization import quantized_query_engine
+            return quantized_query_engine(
+                self.index, self.quantized_index, self.chroma_collection,
+                similarity_top_k=self.similarity_top_k, where=where, **kwargs
+            )
+        if where:
+            kwargs["vector_store_kwargs"] = {"where": where}
+        return self.index.as_query_engine(similarity_top_k=self.similarity_top_k, **kwargs)
+
+    def _format_response(self, response, answer=None):
+        """Convert a query engine response into the answer and its sources"""
+        # Extract source information
+        sources = [
+            {
+                "text": node.node.get_content(),
+                "metadata": node.node.metadata,
+                "score": getattr(node, 'score', None)
+            }
+            for node in getattr(response, 'source_nodes', ())
+        ]
+
+        return {
+            "answer": str(response) if answer is None else answer,
+            "sources": sources
+        }
+
+    def query(self, query_text, on_token=None):
+        """
+        Query the index with a natural language query
+
+        Args:
+            query_text: The query text
+            on_token: Optional callback receiving each answer token as Gemini streams it
+        """
+        self._attach_shared_index()
+        if not self.index:
+            self._log_error("Index not built yet. Please build the index first.")
+            return {
+                "answer": "Index not built yet. Please build the index first.",
+                "sources": []
+            }
+
+        # Serve repeated or near-duplicate prompts from the cache
+        cached, query_embedding = self.query_cache.lookup(query_text)
+        if cached is not None:
+            return cached
+
+        try:
+            # Create query engine
+            query_engine = self._create_query_engine(streaming=on_token is not None)
+
+            # Execute query
+            response = query_engine.query(query_text)
+            if on_token is not None:
+                tokens = []
+                for token in response.response_gen:
+                    tokens.append(token)
+                    on_token(token)
+                answer = "".join(tokens)
+            else:
+                answer = str(response)
+
+            result = self._format_response(response, answer)
+            self.query_cache.store(query_text, result, query_embedding)
+            return result
+        except Exception as e:
+            self._log_error(f"Error during query: {str(e)}")
+            traceback.print_exc()
+            return {
+                "answer": f"Error during query: {str(e)}",
+                "sources": []
+            }
+
+    async def aquery(self, query_text, use_hyde=False):
+        """
+        Asynchronously query the index with a natural language query
+
+        Args:
+            query_text: The query text
+            use_hyde: Also retrieve with a HyDE hypothetical answer, concurrently with the original query
+        """
+        self._attach_shared_index()
+        if not self.index:
+            self._log_error("Index not built yet. Please build the index first.")
+            return {
+                "answer": "Index not built yet. Please build the index first.",
+                "sources": []
+            }
+
+        # Serve repeated or near-duplicate prompts from the cache
+        cached, query_embedding = self.query_cache.lookup(query_text)
+        if cached is not None:
+            return cached
+
+        try:
+            query_engine = self._create_query_engine(use_async=True)
+            if use_hyde:
+                from colab_hyde import ahyde_query
+                response = await ahyde_query(query_engine, query_text, llm=get_answer_llm(self.api_key))
+            else:
+                response = await query_engine.aquery(query_text)
+
+            result = self._format_response(response)
+            self.query_cache.store(query_text, result, query_embedding)
+            return result
+        except Exception as e:
+            self._log_error(f"Error during query: {str(e)}")
+            traceback.print_exc()
+            return {
+                "answer": f"Error during query: {str(e)}",
+                "sources": []
+            }
+
+    def chat_interface(self):
+        """Simple chat interface for testing"""
+        print("\n===== Gemini Chatbot =====")
+        print("Type 'exit' to quit")
+        print("========================\n")
+
+        while True:
+            query = input("\nYou: ")
+            if query.lower() in ['exit', 'quit', 'q']:
+                break
+
+            response = self.query(query)
+            print(f"\nBot: {response['answer']}")
+
+            # Print sources
+            if response['sources']:
+                print("\nSources:")
+                for i, source in enumerate(response['sources'][:2], 1):
+                    source_name = source.get('metadata', {}).get('source', f"Source {i}")
+                    print(f"- {source_name}")
+
+def main(chatbot_cls=GeminiChatbot):
+    """Build the index and run the command-line chat loop"""
+    print("Initializing chatbot...")
+    chatbot = chatbot_cls()
+
+    print("Loading documents...")
+    if chatbot.load_documents():
+        print("Building index...")
+        if chatbot.build_index():
+            print("Ready to chat!")
+            chatbot.chat_interface()
+
+if __name__ == "__main__":
+    main()
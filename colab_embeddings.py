@@ -0,0 +1,43 @@
+"""
+Gemini embedding model for LlamaIndex that embeds chunks in batched requests
+"""
+import google.generativeai as genai
+
+try:
+    from llama_index.core.embeddings import BaseEmbedding
+except ImportError:
+    from llama_index.embeddings.base import BaseEmbedding
+
+from colab_utils import EMBED_MODEL, embed_query
+
+# Maximum number of texts the Gemini API accepts in a single embedding request
+MAX_BATCH_SIZE = 100
+
+class BatchedGeminiEmbedding(BaseEmbedding):
+    """Gemini embeddings that send a whole batch of chunks per API request"""
+
+    def __init__(self, model_name=EMBED_MODEL, **kwargs):
+        kwargs.setdefault("embed_batch_size", MAX_BATCH_SIZE)
+        super().__init__(model_name=model_name, **kwargs)
+
+    @classmethod
+    def class_name(cls):
+        return "BatchedGeminiEmbedding"
+
+    def _embed(self, content, task_type):
+        result = genai.embed_content(model=self.model_name, content=content, task_type=task_type)
+        return result["embedding"]
+
+    def _get_query_embedding(self, query):
+        # Memoized: Streamlit reruns and the query cache ask for the same queries again
+        return list(embed_query(query, self.model_name))
+
+    async def _aget_query_embedding(self, query):
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text):
+        return self._embed(text, "retrieval_document")
+
+    def _get_text_embeddings(self, texts):
+        # One request for the whole batch instead of one per chunk
+        return self._embed(list(texts), "retrieval_document")
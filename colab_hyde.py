@@ -0,0 +1,56 @@
+"""
+Async HyDE (hypothetical document embeddings) retrieval for the chatbot query engines
+"""
+import asyncio
+import logging
+
+try:
+    from llama_index.core.indices.query.query_transform import HyDEQueryTransform
+    from llama_index.core.schema import QueryBundle
+except ImportError:
+    from llama_index.indices.query.query_transform import HyDEQueryTransform
+    from llama_index.schema import QueryBundle
+
+logger = logging.getLogger(__name__)
+
+def merge_nodes(*node_lists):
+    """Merge retrieved nodes by id, keeping each node's best score"""
+    merged = {}
+    for nodes in node_lists:
+        for node in nodes:
+            best = merged.get(node.node.node_id)
+            if best is None or (node.score or 0.0) > (best.score or 0.0):
+                merged[node.node.node_id] = node
+    return sorted(merged.values(), key=lambda n: n.score or 0.0, reverse=True)
+
+async def ahyde_query(query_engine, query_text, llm=None):
+    """
+    Answer a query using both the original and a HyDE-expanded retrieval
+
+    The original query is retrieved while the LLM is still writing the
+    hypothetical answer, so the plain retrieval overlaps the HyDE generation
+    instead of running after it. The merged nodes are synthesized once.
+
+    Args:
+        query_engine: Retriever-backed query engine (exposes retriever and asynthesize)
+        query_text: The query text
+        llm: LLM that writes the hypothetical answer, or None for LlamaIndex's default
+
+    Returns:
+        Response from the query engine's synthesizer
+    """
+    hyde = HyDEQueryTransform(llm=llm, include_original=True)
+    query_bundle = QueryBundle(query_text)
+
+    async def retrieve_hypothetical():
+        # HyDEQueryTransform only has a blocking run(), so keep it off the event loop
+        hyde_bundle = await asyncio.to_thread(hyde.run, query_bundle)
+        return await query_engine.retriever.aretrieve(hyde_bundle)
+
+    original_nodes, hyde_nodes = await asyncio.gather(
+        query_engine.retriever.aretrieve(query_bundle),
+        retrieve_hypothetical(),
+    )
+    nodes = merge_nodes(original_nodes, hyde_nodes)
+    logger.info(f"HyDE retrieval: {len(original_nodes)} original + {len(hyde_nodes)} hypothetical -> {len(nodes)} nodes")
+    return await query_engine.asynthesize(query_bundle, nodes)
@@ -0,0 +1,231 @@
+"""
+Int8 scalar-quantized retrieval over the embeddings stored in Chroma
+"""
+import logging
+
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+try:
+    from llama_index.core.retrievers import BaseRetriever
+    from llama_index.core.schema import NodeWithScore, TextNode
+    from llama_index.core.query_engine import RetrieverQueryEngine
+    from llama_index.core.vector_stores.utils import metadata_dict_to_node
+except ImportError:
+    from llama_index.retrievers import BaseRetriever
+    from llama_index.schema import NodeWithScore, TextNode
+    from llama_index.query_engine import RetrieverQueryEngine
+    from llama_index.vector_stores.utils import metadata_dict_to_node
+
+logger = logging.getLogger(__name__)
+
+# Rows of int8 codes upcast to int32 at a time while scanning
+SCAN_BLOCK_SIZE = 4096
+
+if numba is not None:
+    @numba.njit(parallel=True, cache=True)
+    def _i8_dots(codes, q_codes):
+        """Int8 dot products accumulated in int32, without upcasting the codes to a copy"""
+        dots = np.empty(codes.shape[0], dtype=np.int32)
+        for i in numba.prange(codes.shape[0]):
+            total = np.int32(0)
+            for j in range(codes.shape[1]):
+                total += np.int32(codes[i, j]) * np.int32(q_codes[j])
+            dots[i] = total
+        return dots
+else:
+    _i8_dots = None
+
+def quantize_int8(vectors):
+    """
+    Quantize float32 vectors to int8 with a per-vector min/scale
+
+    Args:
+        vectors: Array of shape (N, D) or (D,)
+
+    Returns:
+        tuple: (codes, mins, scales) where vector ~= (codes + 128) * scale + min
+    """
+    x = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    mins = x.min(axis=1)
+    scales = (x.max(axis=1) - mins) / 255.0
+    scales[scales == 0] = 1.0
+    codes = np.round((x - mins[:, None]) / scales[:, None] - 128).astype(np.int8)
+    return codes, mins, scales
+
+class Int8VectorIndex:
+    """In-memory int8 copy of a Chroma collection used for the coarse similarity scan"""
+
+    def __init__(self, ids, codes, mins, scales):
+        self.ids = list(ids)
+        self._positions = {node_id: i for i, node_id in enumerate(self.ids)}
+        self.codes = np.ascontiguousarray(codes, dtype=np.int8)
+        self.mins = mins.astype(np.float32)
+        self.scales = scales.astype(np.float32)
+        self.dim = self.codes.shape[1] if len(self.ids) else 0
+
+        # Per-vector terms of the dequantized dot product, computed once
+        self.code_sums = self.codes.sum(axis=1, dtype=np.int32)
+        self.norms = np.empty(len(self.ids), dtype=np.float32)
+        for start in range(0, len(self.ids), SCAN_BLOCK_SIZE):
+            end = start + SCAN_BLOCK_SIZE
+            block = (self.codes[start:end].astype(np.float32) + 128) * self.scales[start:end, None]
+            self.norms[start:end] = np.linalg.norm(block + self.mins[start:end, None], axis=1)
+        self.norms[self.norms == 0] = 1.0
+
+    @classmethod
+    def from_collection(cls, chroma_collection):
+        """Quantize every embedding stored in a Chroma collection"""
+        result = chroma_collection.get(include=["embeddings"])
+        ids = result["ids"]
+        if not len(ids):
+            return cls([], np.empty((0, 0), dtype=np.int8), np.empty(0), np.empty(0))
+
+        codes, mins, scales = quantize_int8(result["embeddings"])
+        logger.info(f"Quantized {len(ids)} embeddings to int8 ({codes.nbytes} bytes)")
+        return cls(ids, codes, mins, scales)
+
+    @staticmethod
+    def _int_dots(codes, q_codes):
+        """Integer dot products of each code vector with the query codes"""
+        if _i8_dots is not None:
+            return _i8_dots(np.ascontiguousarray(codes), np.ascontiguousarray(q_codes))
+
+        # Without numba, upcast one block at a time to bound the int32 copy
+        q32 = q_codes.astype(np.int32)
+        dots = np.empty(len(codes), dtype=np.int32)
+        for start in range(0, len(codes), SCAN_BLOCK_SIZE):
+            block = codes[start:start + SCAN_BLOCK_SIZE]
+            dots[start:start + SCAN_BLOCK_SIZE] = block.astype(np.int32) @ q32
+        return dots
+
+    def search(self, query_embedding, top_k, allowed_ids=None):
+        """
+        Approximate cosine search using int8 codes for both query and vectors
+
+        Args:
+            query_embedding: Float query embedding
+            top_k: Number of candidates to return
+            allowed_ids: Optional ids to restrict the scan to (metadata pre-filter)
+
+        Returns:
+            list: Candidate ids ordered by approximate similarity
+        """
+        if not self.ids:
+            return []
+
+        if allowed_ids is None:
+            rows = slice(None)
+            row_ids = self.ids
+        else:
+            rows = np.array(
+                sorted(self._positions[i] for i in allowed_ids if i in self._positions), dtype=np.intp
+            )
+            if not len(rows):
+                return []
+            row_ids = [self.ids[i] for i in rows]
+        codes, code_sums = self.codes[rows], self.code_sums[rows]
+        mins, scales, norms = self.mins[rows], self.scales[rows], self.norms[rows]
+
+        q_codes, q_mins, q_scales = quantize_int8(query_embedding)
+        q_codes, q_min, q_scale = q_codes[0], q_mins[0], q_scales[0]
+        q_sum = int(q_codes.sum(dtype=np.int32))
+        d = self.dim
+
+        # Expand (s_q (c_q + 128) + m_q) . (s_i (c_i + 128) + m_i) in terms of the int dot c_q . c_i
+        offset_dots = self._int_dots(codes, q_codes) + 128 * (q_sum + code_sums) + d * 128 * 128
+        scores = (
+            q_scale * scales * offset_dots
+            + q_scale * mins * (q_sum + 128 * d)
+            + q_min * scales * (code_sums + 128 * d)
+            + d * q_min * mins
+        ) / norms
+
+        top_k = min(top_k, len(row_ids))
+        candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+        candidates = candidates[np.argsort(-scores[candidates])]
+        return [row_ids[i] for i in candidates]
+
+class QuantizedRetriever(BaseRetriever):
+    """Retriever that scans int8 codes and rescores the candidates in float32"""
+
+    def __init__(self, index, quantized_index, chroma_collection, similarity_top_k=2, oversample=4, where=None):
+        """
+        Initialize the retriever
+
+        Args:
+            index: VectorStoreIndex used to embed queries
+            quantized_index: Int8VectorIndex built from the collection
+            chroma_collection: Chroma collection holding the full-precision vectors
+            similarity_top_k: Number of nodes to return
+            oversample: Factor of extra int8 candidates rescored in float32
+            where: Optional Chroma where clause restricting which nodes are scanned
+        """
+        self._index = index
+        self._quantized_index = quantized_index
+        self._chroma_collection = chroma_collection
+        self._similarity_top_k = similarity_top_k
+        self._oversample = oversample
+        self._where = where
+        super().__init__()
+
+    def _embed_query(self, query_bundle):
+        if query_bundle.embedding is not None:
+            return query_bundle.embedding
+        embed_model = getattr(self._index, "_embed_model", None)
+        if embed_model is None:
+            embed_model = self._index.service_context.embed_model
+        # Transformed queries (e.g. HyDE) carry several strings to embed and average
+        return embed_model.get_agg_embedding_from_queries(query_bundle.embedding_strs)
+
+    def _retrieve(self, query_bundle):
+        query_embedding = np.asarray(self._embed_query(query_bundle), dtype=np.float32)
+        allowed_ids = None
+        if self._where:
+            allowed_ids = set(self._chroma_collection.get(where=self._where, include=[])["ids"])
+        candidate_ids = self._quantized_index.search(
+            query_embedding, self._similarity_top_k * self._oversample, allowed_ids
+        )
+        if not candidate_ids:
+            return []
+
+        # Rescore the candidates with their full-precision vectors
+        result = self._chroma_collection.get(
+            ids=candidate_ids, include=["embeddings", "documents", "metadatas"]
+        )
+        vectors = np.asarray(result["embeddings"], dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1) * (np.linalg.norm(query_embedding) or 1.0)
+        norms[norms == 0] = 1.0
+        scores = (vectors @ query_embedding) / norms
+        order = np.argsort(-scores)[:self._similarity_top_k]
+
+        nodes = []
+        for i in order:
+            node_id = result["ids"][i]
+            text = result["documents"][i]
+            metadata = result["metadatas"][i] or {}
+            try:
+                node = metadata_dict_to_node(metadata)
+                node.set_content(text)
+            except Exception:
+                node = TextNode(id_=node_id, text=text, metadata=metadata)
+            nodes.append(NodeWithScore(node=node, score=float(scores[i])))
+        return nodes
+
+def quantized_query_engine(index, quantized_index, chroma_collection, similarity_top_k=2, oversample=4,
+                           where=None, **kwargs):
+    """
+    Create a query engine over the index that retrieves through the int8 codes
+
+    Extra keyword arguments (e.g. streaming, use_async) are passed to
+    RetrieverQueryEngine.from_args.
+    """
+    retriever = QuantizedRetriever(
+        index, quantized_index, chroma_collection,
+        similarity_top_k=similarity_top_k, oversample=oversample, where=where
+    )
+    return RetrieverQueryEngine.from_args(retriever, **kwargs)
@@ -0,0 +1,325 @@
+"""
+sqlite-vec vector database for the chatbot, used instead of Chroma when VECTOR_BACKEND=sqlite-vec
+
+SQLiteVecClient and SQLiteVecCollection mirror the parts of the chromadb
+client/collection API the chatbot uses, so the manifest, int8 quantization and
+rescoring code work unchanged; SQLiteVecVectorStore exposes a collection to
+LlamaIndex. Vectors live in a vec0 virtual table and are searched with KNN MATCH
+queries, so opening the database doesn't rebuild an in-memory HNSW graph.
+"""
+import json
+import logging
+import os
+import re
+import sqlite3
+
+import numpy as np
+
+try:
+    from llama_index.core.bridge.pydantic import PrivateAttr
+    from llama_index.core.schema import MetadataMode
+    from llama_index.core.vector_stores.types import (
+        BasePydanticVectorStore,
+        FilterOperator,
+        VectorStoreQueryResult,
+    )
+    from llama_index.core.vector_stores.utils import metadata_dict_to_node, node_to_metadata_dict
+except ImportError:
+    from llama_index.bridge.pydantic import PrivateAttr
+    from llama_index.schema import MetadataMode
+    from llama_index.vector_stores.types import (
+        BasePydanticVectorStore,
+        FilterOperator,
+        VectorStoreQueryResult,
+    )
+    from llama_index.vector_stores.utils import metadata_dict_to_node, node_to_metadata_dict
+
+logger = logging.getLogger(__name__)
+
+# Database file created inside the vector database directory
+SQLITE_VEC_FILE = "vec.db"
+
+def _connect(db_path):
+    """Open a SQLite connection with the sqlite-vec extension loaded"""
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    conn.enable_load_extension(True)
+    try:
+        import sqlite_vec
+        sqlite_vec.load(conn)
+    except ImportError:
+        conn.load_extension("vec0")
+    conn.enable_load_extension(False)
+    return conn
+
+def _where_sql(where):
+    """
+    Translate a Chroma-style where clause into SQL over the JSON metadata column
+
+    Supports {"key": value}, {"key": {"$eq": value}} and {"key": {"$in": [values]}}.
+
+    Returns:
+        tuple: (sql, params)
+    """
+    clauses, params = [], []
+    for key, condition in where.items():
+        if not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", key):
+            raise ValueError(f"Invalid metadata key: {key}")
+        column = f"json_extract(metadata, '$.{key}')"
+        if isinstance(condition, dict) and "$in" in condition:
+            values = list(condition["$in"])
+            clauses.append(f"{column} IN ({','.join('?' * len(values))})" if values else "0")
+            params.extend(values)
+        else:
+            if isinstance(condition, dict):
+                condition = condition["$eq"]
+            clauses.append(f"{column} = ?")
+            params.append(condition)
+    return " AND ".join(clauses), params
+
+def _to_blob(embedding):
+    """Serialize an embedding in sqlite-vec's float32 format"""
+    return np.asarray(embedding, dtype=np.float32).tobytes()
+
+class SQLiteVecCollection:
+    """A named collection of node ids, documents, metadata and embeddings"""
+
+    def __init__(self, conn, name):
+        self._conn = conn
+        self.name = name
+        self._nodes = f"{name}_nodes"
+        self._vectors = f"{name}_vectors"
+        self._meta = f"{name}_meta"
+        with self._conn:
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self._nodes} ("
+                "rowid INTEGER PRIMARY KEY, node_id TEXT UNIQUE NOT NULL, document TEXT, metadata TEXT)"
+            )
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self._meta} (key TEXT PRIMARY KEY, value TEXT)"
+            )
+
+    def _has_vectors(self):
+        row = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = ?", (self._vectors,)
+        ).fetchone()
+        return row is not None
+
+    @property
+    def metadata(self):
+        """Collection-level metadata, like a Chroma collection's metadata"""
+        rows = self._conn.execute(f"SELECT key, value FROM {self._meta}").fetchall()
+        return {key: json.loads(value) for key, value in rows} or None
+
+    def modify(self, metadata=None):
+        """Replace the collection-level metadata"""
+        with self._conn:
+            self._conn.execute(f"DELETE FROM {self._meta}")
+            self._conn.executemany(
+                f"INSERT INTO {self._meta} (key, value) VALUES (?, ?)",
+                [(key, json.dumps(value)) for key, value in (metadata or {}).items()],
+            )
+
+    def count(self):
+        """Number of stored nodes"""
+        return self._conn.execute(f"SELECT COUNT(*) FROM {self._nodes}").fetchone()[0]
+
+    def add(self, ids, embeddings, metadatas=None, documents=None):
+        """Insert or replace nodes and their embeddings"""
+        if not ids:
+            return
+        metadatas = metadatas or [{}] * len(ids)
+        documents = documents or [""] * len(ids)
+        with self._conn:
+            if not self._has_vectors():
+                dim = len(embeddings[0])
+                self._conn.execute(
+                    f"CREATE VIRTUAL TABLE {self._vectors} "
+                    f"USING vec0(embedding float[{dim}] distance_metric=cosine)"
+                )
+            self._delete_ids(ids)
+            for node_id, embedding, metadata, document in zip(ids, embeddings, metadatas, documents):
+                cursor = self._conn.execute(
+                    f"INSERT INTO {self._nodes} (node_id, document, metadata) VALUES (?, ?, ?)",
+                    (node_id, document, json.dumps(metadata)),
+                )
+                self._conn.execute(
+                    f"INSERT INTO {self._vectors} (rowid, embedding) VALUES (?, ?)",
+                    (cursor.lastrowid, _to_blob(embedding)),
+                )
+
+    def _delete_ids(self, ids):
+        placeholders = ",".join("?" * len(ids))
+        rowids = [
+            row[0] for row in self._conn.execute(
+                f"SELECT rowid FROM {self._nodes} WHERE node_id IN ({placeholders})", list(ids)
+            )
+        ]
+        if not rowids:
+            return
+        placeholders = ",".join("?" * len(rowids))
+        self._conn.execute(f"DELETE FROM {self._nodes} WHERE rowid IN ({placeholders})", rowids)
+        if self._has_vectors():
+            self._conn.execute(f"DELETE FROM {self._vectors} WHERE rowid IN ({placeholders})", rowids)
+
+    def delete(self, ids=None, where=None):
+        """
+        Delete nodes by id, or by metadata matches
+
+        Args:
+            ids: Node ids to delete
+            where: Chroma-style metadata conditions that deleted nodes must all match
+        """
+        if where:
+            clauses, params = _where_sql(where)
+            matched = [
+                row[0] for row in self._conn.execute(
+                    f"SELECT node_id FROM {self._nodes} WHERE {clauses}", params
+                )
+            ]
+            ids = [node_id for node_id in matched if ids is None or node_id in ids]
+        if ids:
+            with self._conn:
+                self._delete_ids(ids)
+
+    def get(self, ids=None, where=None, include=("metadatas", "documents")):
+        """
+        Fetch stored nodes, optionally restricted to the given ids and metadata conditions
+
+        Returns:
+            dict: "ids" plus the requested "embeddings", "documents" and "metadatas" lists
+        """
+        query = f"SELECT rowid, node_id, document, metadata FROM {self._nodes}"
+        conditions, params = [], []
+        if ids is not None:
+            conditions.append(f"node_id IN ({','.join('?' * len(ids))})")
+            params.extend(ids)
+        if where:
+            clauses, where_params = _where_sql(where)
+            conditions.append(clauses)
+            params.extend(where_params)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        rows = self._conn.execute(query, params).fetchall()
+
+        result = {"ids": [row[1] for row in rows]}
+        if "documents" in include:
+            result["documents"] = [row[2] for row in rows]
+        if "metadatas" in include:
+            result["metadatas"] = [json.loads(row[3]) if row[3] else None for row in rows]
+        if "embeddings" in include:
+            vectors = {}
+            if rows and self._has_vectors():
+                rowids = [row[0] for row in rows]
+                vectors = dict(self._conn.execute(
+                    f"SELECT rowid, embedding FROM {self._vectors} "
+                    f"WHERE rowid IN ({','.join('?' * len(rowids))})", rowids
+                ).fetchall())
+            result["embeddings"] = [
+                np.frombuffer(vectors[row[0]], dtype=np.float32) for row in rows
+            ]
+        return result
+
+    def knn(self, query_embedding, k, where=None):
+        """
+        Nearest neighbours of an embedding by cosine distance
+
+        Args:
+            query_embedding: Query embedding
+            k: Number of neighbours
+            where: Optional Chroma-style metadata conditions, applied before the KNN scan
+
+        Returns:
+            list: (node_id, document, metadata, distance) tuples, nearest first
+        """
+        if k <= 0 or not self._has_vectors():
+            return []
+        knn_filter, params = "", [_to_blob(query_embedding), k]
+        if where:
+            clauses, where_params = _where_sql(where)
+            knn_filter = f" AND rowid IN (SELECT rowid FROM {self._nodes} WHERE {clauses})"
+            params.extend(where_params)
+        rows = self._conn.execute(
+            f"SELECT n.node_id, n.document, n.metadata, v.distance "
+            f"FROM (SELECT rowid, distance FROM {self._vectors} "
+            f"WHERE embedding MATCH ? AND k = ?{knn_filter}) v "
+            f"JOIN {self._nodes} n ON n.rowid = v.rowid ORDER BY v.distance",
+            params,
+        ).fetchall()
+        return [(node_id, document, json.loads(metadata), distance) for node_id, document, metadata, distance in rows]
+
+    def drop(self):
+        """Drop all tables belonging to the collection"""
+        with self._conn:
+            for table in (self._vectors, self._nodes, self._meta):
+                self._conn.execute(f"DROP TABLE IF EXISTS {table}")
+
+class SQLiteVecClient:
+    """Persistent sqlite-vec database with a chromadb.PersistentClient-style API"""
+
+    def __init__(self, path):
+        os.makedirs(path, exist_ok=True)
+        self._conn = _connect(os.path.join(path, SQLITE_VEC_FILE))
+
+    def get_or_create_collection(self, name):
+        if not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", name):
+            raise ValueError(f"Invalid collection name: {name}")
+        return SQLiteVecCollection(self._conn, name)
+
+    def delete_collection(self, name):
+        self.get_or_create_collection(name).drop()
+
+class SQLiteVecVectorStore(BasePydanticVectorStore):
+    """LlamaIndex vector store backed by a SQLiteVecCollection"""
+
+    stores_text: bool = True
+    flat_metadata: bool = True
+
+    _collection = PrivateAttr()
+
+    def __init__(self, collection, **kwargs):
+        super().__init__(**kwargs)
+        self._collection = collection
+
+    @classmethod
+    def class_name(cls):
+        return "SQLiteVecVectorStore"
+
+    @property
+    def client(self):
+        return self._collection
+
+    def add(self, nodes, **add_kwargs):
+        ids, embeddings, metadatas, documents = [], [], [], []
+        for node in nodes:
+            ids.append(node.node_id)
+            embeddings.append(node.get_embedding())
+            metadatas.append(node_to_metadata_dict(node, remove_text=True, flat_metadata=self.flat_metadata))
+            documents.append(node.get_content(metadata_mode=MetadataMode.NONE))
+        self._collection.add(ids=ids, embeddings=embeddings, metadatas=metadatas, documents=documents)
+        return ids
+
+    def delete(self, ref_doc_id, **delete_kwargs):
+        self._collection.delete(where={"document_id": ref_doc_id})
+
+    def query(self, query, **kwargs):
+        # Accept both LlamaIndex metadata filters and a Chroma-style where clause
+        where = dict(kwargs.get("where") or {})
+        for metadata_filter in query.filters.filters if query.filters else []:
+            operator = getattr(metadata_filter, "operator", FilterOperator.EQ)
+            if operator == FilterOperator.EQ:
+                where[metadata_filter.key] = metadata_filter.value
+            elif operator == FilterOperator.IN:
+                where[metadata_filter.key] = {"$in": metadata_filter.value}
+            else:
+                raise ValueError(f"sqlite-vec store doesn't support the {operator} metadata filter")
+
+        nodes, similarities, ids = [], [], []
+        for node_id, document, metadata, distance in self._collection.knn(
+            query.query_embedding, query.similarity_top_k, where=where
+        ):
+            node = metadata_dict_to_node(metadata)
+            node.set_content(document)
+            nodes.append(node)
+            similarities.append(1.0 - distance)
+            ids.append(node_id)
+        return VectorStoreQueryResult(nodes=nodes, similarities=similarities, ids=ids)
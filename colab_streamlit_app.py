@@ -3,154 +3,67 @@
 Streamlit web interface for the chatbot - Google Colab version
 """
 import streamlit as st
-import logging
-import sys
+import asyncio
 import os
 import google.generativeai as genai
-from dotenv import load_dotenv
-import chromadb
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+from chatbot_core import CHROMA_DB_DIRECTORY, DATA_DIR
+from chatbot_core import GeminiChatbot as _BaseChatbot
+from colab_utils import MANIFEST_FILE, SIMILARITY_TOP_K
 
-# Load environment variables
-load_dotenv()
+# Write buffer for uploaded documents
+UPLOAD_BUFFER_SIZE = 1024 * 1024
 
-# Directory paths
-DATA_DIR = "./data"
-CHROMA_DB_DIRECTORY = "./chroma_db"
+@st.cache_resource(show_spinner=False)
+def configure_gemini(api_key):
+    """Configure the Gemini client once per process for a given API key"""
+    genai.configure(api_key=api_key)
 
-class GeminiChatbot:
-    def __init__(self):
-        # Get Gemini API key
-        self.api_key = os.getenv("GEMINI_API_KEY")
-        if not self.api_key:
+@st.cache_data(ttl=5, show_spinner=False)
+def fs_status():
+    """
+    Scan the data and database directories once for the sidebar and chat handler
+
+    Returns:
+        dict: "data_files" (sorted document names), "data_nonempty" and
+        "index_built" (a manifest has been written next to the vector database)
+    """
+    data_files = []
+    if os.path.isdir(DATA_DIR):
+        with os.scandir(DATA_DIR) as entries:
+            data_files = sorted(e.name for e in entries if e.is_file() and not e.name.startswith("."))
+    index_built = False
+    if os.path.isdir(CHROMA_DB_DIRECTORY):
+        with os.scandir(CHROMA_DB_DIRECTORY) as entries:
+            index_built = any(e.name == MANIFEST_FILE for e in entries)
+    return {
+        "data_files": data_files,
+        "data_nonempty": bool(data_files),
+        "index_built": index_built,
+    }
+
+class GeminiChatbot(_BaseChatbot):
+    """Chatbot that reports to the Streamlit page instead of the console"""
+
+    def _get_api_key(self):
+        api_key = os.getenv("GEMINI_API_KEY")
+        if not api_key:
             print("GEMINI_API_KEY not found in environment. Please set it first.")
-            self.api_key = st.text_input("Enter your Gemini API key:", type="password")
-            if not self.api_key:
+            api_key = st.text_input("Enter your Gemini API key:", type="password")
+            if not api_key:
                 st.error("Gemini API key is required to continue.")
                 st.stop()
-            os.environ["GEMINI_API_KEY"] = self.api_key
-        
-        # Configure Gemini
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel('gemini-pro')
-        self.index = None
-        
-    def load_documents(self):
-        """Load documents from the data directory"""
-        if not os.path.exists(DATA_DIR):
-            os.makedirs(DATA_DIR)
-            st.info(f"Created data directory at {DATA_DIR}")
-        
-        if not os.listdir(DATA_DIR):
-            st.warning("Data directory is empty. Please add some documents.")
-            return False
-            
-        return True
-        
-    def build_index(self):
-        """Build vector index from documents"""
-        try:
-            # Dynamic imports to handle different versions of llama-index
-            try:
-                # Try importing from llama_index (newer versions)
-                from llama_index import VectorStoreIndex, SimpleDirectoryReader, StorageContext
-                from llama_index.node_parser import SentenceSplitter
-                from llama_index.vector_stores.chroma import ChromaVectorStore
-                st.info("Using llama_index package")
-            except ImportError:
-                # Try importing from llama_index.core (older or different versions)
-                from llama_index.core import VectorStoreIndex, SimpleDirectoryReader, StorageContext
-                from llama_index.core.node_parser import SentenceSplitter
-                try:
-                    from llama_index.core.vector_stores.chroma import ChromaVectorStore
-                    st.info("Using llama_index.core package")
-                except ImportError:
-                    from llama_index.vector_stores.chroma import ChromaVectorStore
-                    st.info("Using mixed llama_index imports")
-            
-            # Load documents
-            documents = SimpleDirectoryReader(DATA_DIR).load_data()
-            
-            # Create sentence splitter for text chunking
-            text_splitter = SentenceSplitter(
-                chunk_size=1000,
-                chunk_overlap=200
-            )
-            
-            # Set up Chroma client
-            if not os.path.exists(CHROMA_DB_DIRECTORY):
-                os.makedirs(CHROMA_DB_DIRECTORY)
-                
-            chroma_client = chromadb.PersistentClient(path=CHROMA_DB_DIRECTORY)
-            chroma_collection = chroma_client.get_or_create_collection("documents")
-            vector_store = ChromaVectorStore(chroma_collection=chroma_collection)
-            storage_context = StorageContext.from_defaults(vector_store=vector_store)
-            
-            # Build index with error handling for different parameter names
-            try:
-                self.index = VectorStoreIndex.from_documents(
-                    documents,
-                    storage_context=storage_context,
-                    transformations=[text_splitter],
-                )
-            except TypeError:
-                # Try alternative approach if transformations parameter doesn't work
-                self.index = VectorStoreIndex.from_documents(
-                    documents,
-                    storage_context=storage_context,
-                    node_parser=text_splitter,
-                )
-            
-            st.success("Index built successfully!")
-            return True
-        except Exception as e:
-            st.error(f"Error building index: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            return False
-            
-    def query(self, query_text):
-        """Query the index with a natural language query"""
-        if not self.index:
-            st.error("Index not built yet. Please build the index first.")
-            return {
-                "answer": "Index not built yet. Please build the index first.",
-                "sources": []
-            }
-            
-        try:
-            # Create query engine
-            query_engine = self.index.as_query_engine()
-            
-            # Execute query
-            response = query_engine.query(query_text)
-            
-            # Extract source information
-            sources = []
-            if hasattr(response, 'source_nodes'):
-                for node in response.source_nodes:
-                    source = {
-                        "text": node.node.get_content(),
-                        "metadata": node.node.metadata,
-                        "score": node.score if hasattr(node, 'score') else None
-                    }
-                    sources.append(source)
-            
-            return {
-                "answer": str(response),
-                "sources": sources
-            }
-        except Exception as e:
-            st.error(f"Error during query: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            return {
-                "answer": f"Error during query: {str(e)}",
-                "sources": []
-            }
+            os.environ["GEMINI_API_KEY"] = api_key
+        return api_key
+
+    def _configure_gemini(self, api_key):
+        configure_gemini(api_key)
+
+    def _log_info(self, message):
+        st.info(message)
+
+    def _log_error(self, message):
+        st.error(message)
 
 def init_session_state():
     """Initialize session state variables"""
@@ -181,36 +94,55 @@ def main():
         if st.session_state.chatbot is None:
             st.session_state.chatbot = GeminiChatbot()
         
+        status = fs_status()
+        
         # Check data directory status
-        data_dir_status = "✅ Available" if os.path.exists(DATA_DIR) and os.listdir(DATA_DIR) else "❌ Empty"
+        data_dir_status = "✅ Available" if status["data_nonempty"] else "❌ Empty"
         st.info(f"Data Directory: {data_dir_status}")
         
         # Check index status
-        index_status = "✅ Available" if os.path.exists(CHROMA_DB_DIRECTORY) else "❌ Not Built"
+        index_status = "✅ Available" if status["index_built"] else "❌ Not Built"
         st.info(f"Vector Index: {index_status}")
         
         # Upload documents
         with st.expander("Upload Documents"):
             uploaded_file = st.file_uploader("Upload a document", type=["txt", "md", "pdf"])
-            if uploaded_file is not None:
+            # The uploader keeps returning the same file on every rerun, so only write it once
+            if uploaded_file is not None and st.session_state.get("last_upload") != (uploaded_file.name, uploaded_file.size):
                 if not os.path.exists(DATA_DIR):
                     os.makedirs(DATA_DIR)
                 
+                # Write through a hidden temp file so a half-written upload is never indexed;
+                # getbuffer() hands over a memoryview instead of copying the bytes like getvalue()
                 file_path = os.path.join(DATA_DIR, uploaded_file.name)
-                with open(file_path, "wb") as f:
-                    f.write(uploaded_file.getvalue())
+                tmp_path = os.path.join(DATA_DIR, f".{uploaded_file.name}.part")
+                with open(tmp_path, "wb", buffering=UPLOAD_BUFFER_SIZE) as f:
+                    f.write(uploaded_file.getbuffer())
+                os.replace(tmp_path, file_path)
+                st.session_state.last_upload = (uploaded_file.name, uploaded_file.size)
+                fs_status.clear()
                 st.success(f"File '{uploaded_file.name}' uploaded successfully")
         
-        # Build index button
-        if st.button("Build/Rebuild Vector Index"):
+        # Build index button; only new and changed files are embedded unless a full rebuild is requested
+        full_rebuild = st.checkbox("Full rebuild (re-embed every document)", value=False)
+        if st.button("Build/Update Vector Index"):
             if st.session_state.chatbot.load_documents():
                 with st.spinner("Building vector index..."):
-                    if st.session_state.chatbot.build_index():
+                    if st.session_state.chatbot.build_index(rebuild=full_rebuild):
+                        fs_status.clear()
                         st.success("Vector index built successfully!")
                     else:
                         st.error("Failed to build vector index.")
             else:
                 st.error("No documents found. Please upload some documents first.")
+        
+        # Retrieval settings
+        similarity_top_k = st.slider("Chunks retrieved per query", 1, 20, SIMILARITY_TOP_K)
+        allowed_files = st.multiselect("Only search these documents", status["data_files"])
+        st.session_state.chatbot.set_retrieval_options(similarity_top_k, allowed_files)
+        
+        # HyDE retrieves with a generated hypothetical answer alongside the query
+        use_hyde = st.checkbox("HyDE query expansion", value=False)
     
     # Display chat messages
     for message in st.session_state.messages:
@@ -238,7 +170,7 @@ def main():
         
         # Check if index is built
         if not st.session_state.chatbot.index:
-            if not os.path.exists(CHROMA_DB_DIRECTORY) or not os.listdir(CHROMA_DB_DIRECTORY):
+            if not status["index_built"]:
                 # Need to build index first
                 if st.session_state.chatbot.load_documents():
                     with st.spinner("Building index for the first time..."):
@@ -259,26 +191,38 @@ def main():
         # Generate and display assistant response
         with st.chat_message("assistant"):
             message_placeholder = st.empty()
-            with st.spinner("Thinking..."):
-                response = st.session_state.chatbot.query(prompt)
-                message_placeholder.markdown(response["answer"])
-                
-                # Add assistant message to chat history
-                st.session_state.messages.append({
-                    "role": "assistant", 
-                    "content": response["answer"],
-                    "sources": response["sources"]
-                })
-                
-                # Show sources if available
-                if response["sources"]:
-                    with st.expander("View Sources"):
-                        for i, source in enumerate(response["sources"], 1):
-                            source_name = source.get('metadata', {}).get('source', f"Source {i}")
-                            st.markdown(f"**Document: {source_name}**")
-                            text = source.get('text', '')
-                            if text:
-                                st.text(text[:200] + "..." if len(text) > 200 else text)
+            message_placeholder.markdown("Thinking...")
+            
+            # Render the answer as Gemini streams it
+            streamed = ""
+            def show_token(token):
+                nonlocal streamed
+                streamed += token
+                message_placeholder.markdown(streamed + "▌")
+            
+            if use_hyde:
+                # Original and hypothetical retrievals run concurrently; the answer isn't streamed
+                response = asyncio.run(st.session_state.chatbot.aquery(prompt, use_hyde=True))
+            else:
+                response = st.session_state.chatbot.query(prompt, on_token=show_token)
+            message_placeholder.markdown(response["answer"])
+            
+            # Add assistant message to chat history once the stream has completed
+            st.session_state.messages.append({
+                "role": "assistant", 
+                "content": response["answer"],
+                "sources": response["sources"]
+            })
+            
+            # Show sources if available
+            if response["sources"]:
+                with st.expander("View Sources"):
+                    for i, source in enumerate(response["sources"], 1):
+                        source_name = source.get('metadata', {}).get('source', f"Source {i}")
+                        st.markdown(f"**Document: {source_name}**")
+                        text = source.get('text', '')
+                        if text:
+                            st.text(text[:200] + "..." if len(text) > 200 else text)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,493 @@
+"""
+Shared helpers for the Google Colab chatbot scripts
+"""
+import functools
+import hashlib
+import importlib
+import importlib.util
+import json
+import logging
+import mmap
+import os
+import pkgutil
+from collections import OrderedDict
+
+import numpy as np
+import google.generativeai as genai
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+logger = logging.getLogger(__name__)
+
+# Gemini model used for document, query and cache embeddings
+EMBED_MODEL = "models/embedding-001"
+
+# Gemini model used to generate answers; Flash is fast enough for short retrieved contexts
+GENERATION_MODEL = "gemini-1.5-flash"
+
+@functools.lru_cache(maxsize=None)
+def get_generative_model(model_name=GENERATION_MODEL):
+    """Create the Gemini model once per process instead of once per chatbot"""
+    return genai.GenerativeModel(model_name)
+
+# Number of query embeddings kept in memory
+QUERY_EMBEDDING_CACHE_SIZE = 4096
+
+@functools.lru_cache(maxsize=QUERY_EMBEDDING_CACHE_SIZE)
+def embed_query(query_text, model=EMBED_MODEL):
+    """
+    Embed a query with Gemini, memoized so repeated queries skip the API call
+
+    Shared by the query cache and the index's embedding model, so a query is
+    embedded once per process whether it's looked up, retrieved or both.
+
+    Returns:
+        tuple: The query embedding
+    """
+    result = genai.embed_content(model=model, content=query_text, task_type="retrieval_query")
+    return tuple(result["embedding"])
+
+# Chunking settings (tokens)
+CHUNK_SIZE = 512
+CHUNK_OVERLAP = 50
+
+# Chonkie's fast chunker limits chunks by bytes; roughly 4 bytes per token
+FAST_CHUNK_BYTES = CHUNK_SIZE * 4
+
+# Number of chunks retrieved per query
+SIMILARITY_TOP_K = 5
+
+def create_text_splitter(sentence_splitter_cls):
+    """
+    Create the text chunker used when building the index
+
+    Prefers Chonkie's native fast chunker and falls back to LlamaIndex's
+    SentenceSplitter when llama-index-node-parser-chonkie isn't installed.
+
+    Args:
+        sentence_splitter_cls: SentenceSplitter class resolved for the installed llama-index
+
+    Returns:
+        Node parser to pass as a transformation
+    """
+    try:
+        from llama_index.node_parser.chonkie import Chunker
+        return Chunker("fast", chunk_size=FAST_CHUNK_BYTES)
+    except ImportError:
+        return sentence_splitter_cls(
+            chunk_size=CHUNK_SIZE,
+            chunk_overlap=CHUNK_OVERLAP
+        )
+
+# Vector database backend: "chroma" (default) or "sqlite-vec"
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma").lower()
+
+@functools.lru_cache(maxsize=None)
+def open_vector_db(db_dir):
+    """
+    Open the persistent vector database client for the configured backend
+
+    Memoized so every chatbot in the process shares one client (and one set of
+    file handles and locks) per database directory.
+    """
+    if VECTOR_BACKEND == "sqlite-vec":
+        from colab_sqlite_vec import SQLiteVecClient
+        return SQLiteVecClient(path=db_dir)
+    import chromadb
+    return chromadb.PersistentClient(path=db_dir)
+
+def create_vector_store(collection, chroma_vector_store_cls):
+    """
+    Wrap a collection in the LlamaIndex vector store for the configured backend
+
+    Args:
+        collection: Collection returned by the vector database client
+        chroma_vector_store_cls: ChromaVectorStore class resolved for the installed llama-index
+    """
+    if VECTOR_BACKEND == "sqlite-vec":
+        from colab_sqlite_vec import SQLiteVecVectorStore
+        return SQLiteVecVectorStore(collection)
+    return chroma_vector_store_cls(chroma_collection=collection)
+
+# Candidate modules for each LlamaIndex class across package layouts
+LLAMA_INDEX_CANDIDATES = {
+    "VectorStoreIndex": [
+        "llama_index",
+        "llama_index.core",
+        "llama_index.indices.vector_store",
+        "llama_index.core.indices.vector_store",
+    ],
+    "SimpleDirectoryReader": [
+        "llama_index",
+        "llama_index.core",
+        "llama_index.readers",
+        "llama_index.core.readers",
+    ],
+    "SentenceSplitter": [
+        "llama_index.node_parser",
+        "llama_index.core.node_parser",
+        "llama_index.text_splitter",
+        "llama_index.core.text_splitter",
+    ],
+    "ChromaVectorStore": [
+        "llama_index.vector_stores.chroma",
+        "llama_index.core.vector_stores.chroma",
+        "llama_index.storage.vector_stores.chroma",
+        "llama_index.core.storage.vector_stores.chroma",
+    ],
+    # Optional: without it answers come from LlamaIndex's default LLM
+    "Gemini": [
+        "llama_index.llms.gemini",
+        "llama_index.llms",
+    ],
+}
+
+# Resolved module path of each class, cached next to the Chroma database
+LLAMA_INDEX_PATHS_FILE = "llama_index_paths.json"
+
+def _import_class(module_path, class_name):
+    """Import a class from a module, returning None if it isn't there"""
+    try:
+        return getattr(importlib.import_module(module_path), class_name, None)
+    except ImportError as e:
+        # The module exists but one of its own dependencies is missing
+        logger.warning(f"Could not import {module_path}: {str(e)}")
+        return None
+
+def scan_llama_index_modules():
+    """
+    List the llama_index modules that could provide LLAMA_INDEX_CANDIDATES
+
+    Walks the installed package directories once with pkgutil instead of
+    attempting every candidate import, descending only into packages on the
+    way to a candidate. pkgutil skips namespace packages (such as
+    llama_index.vector_stores in llama-index 0.10+), so directories without
+    an __init__.py are added as packages explicitly.
+
+    Returns:
+        set: Dotted names of the candidate modules that exist
+    """
+    spec = importlib.util.find_spec("llama_index")
+    if spec is None or not spec.submodule_search_locations:
+        return set()
+
+    wanted = set()
+    for candidates in LLAMA_INDEX_CANDIDATES.values():
+        for module_path in candidates:
+            parts = module_path.split(".")
+            wanted.update(".".join(parts[:i]) for i in range(1, len(parts) + 1))
+
+    available = {"llama_index"}
+    pending = [("llama_index", list(spec.submodule_search_locations))]
+    while pending:
+        package, dirs = pending.pop()
+        children = {
+            info.name: info.ispkg
+            for info in pkgutil.iter_modules(dirs, prefix=package + ".")
+        }
+        for directory in dirs:
+            for entry in os.scandir(directory):
+                if entry.is_dir() and entry.name.isidentifier():
+                    children.setdefault(f"{package}.{entry.name}", True)
+
+        for name, is_package in children.items():
+            if name not in wanted:
+                continue
+            available.add(name)
+            if is_package:
+                leaf = name.rsplit(".", 1)[1]
+                subdirs = [os.path.join(d, leaf) for d in dirs if os.path.isdir(os.path.join(d, leaf))]
+                pending.append((name, subdirs))
+    return available
+
+def resolve_llama_index(db_dir):
+    """
+    Resolve the LlamaIndex classes used by the chatbot once per process
+
+    Module paths that worked before are read from llama_index_paths.json and
+    imported directly. Classes missing from that file (or whose cached path
+    no longer imports, e.g. after an upgrade) are imported from the first
+    candidate module that a single package scan finds installed.
+
+    Args:
+        db_dir: Directory holding the Chroma database and the path cache
+
+    Returns:
+        tuple: (classes, paths) - class name -> class (None when not found),
+        and class name -> module path it was imported from
+    """
+    cache_path = os.path.join(db_dir, LLAMA_INDEX_PATHS_FILE)
+    try:
+        with open(cache_path, "r") as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        cached = {}
+
+    classes, paths = {}, {}
+    available = None
+    for class_name, candidates in LLAMA_INDEX_CANDIDATES.items():
+        module_path = cached.get(class_name)
+        cls = _import_class(module_path, class_name) if module_path else None
+        if cls is None:
+            if available is None:
+                available = scan_llama_index_modules()
+            for module_path in candidates:
+                if module_path in available:
+                    cls = _import_class(module_path, class_name)
+                    if cls is not None:
+                        break
+        classes[class_name] = cls
+        if cls is not None:
+            paths[class_name] = module_path
+
+    if paths != cached:
+        try:
+            os.makedirs(db_dir, exist_ok=True)
+            with open(cache_path, "w") as f:
+                json.dump(paths, f, indent=2)
+        except OSError as e:
+            logger.warning(f"Could not cache LlamaIndex module paths: {str(e)}")
+    return classes, paths
+
+# Manifest mapping each indexed file to its content hash and Chroma node ids
+MANIFEST_FILE = "manifest.json"
+
+# Change detection only needs a fast non-cryptographic hash; SHA-256 is the fallback
+HASH_ALGORITHM = "xxh3_128" if xxhash is not None else "sha256"
+
+# Files up to this size are memory-mapped and hashed in one call
+MMAP_HASH_LIMIT = 256 * 1024 * 1024
+
+def file_hash(path, algorithm=HASH_ALGORITHM):
+    """
+    Hash a file's contents for change detection
+
+    Raises:
+        ValueError: If the algorithm isn't available here (e.g. xxh3_128 without xxhash)
+    """
+    if algorithm == "xxh3_128":
+        if xxhash is None:
+            raise ValueError("xxh3_128 hashing requires the xxhash package")
+        h = xxhash.xxh3_128()
+    else:
+        h = hashlib.new(algorithm)
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if 0 < size <= MMAP_HASH_LIMIT:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                h.update(mm)
+        else:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+    return h.hexdigest()
+
+def _rehash_manifest(files, algorithm):
+    """
+    Convert manifest hashes written with another algorithm to HASH_ALGORITHM
+
+    Files that still match their recorded hash get a new-algorithm hash, so
+    switching algorithms (e.g. installing xxhash) doesn't re-embed anything;
+    files that changed or can't be verified are left to be re-indexed.
+    """
+    rehashed = {}
+    for path, entry in files.items():
+        try:
+            unchanged = os.path.isfile(path) and file_hash(path, algorithm) == entry.get("hash")
+        except ValueError:
+            # The old algorithm isn't available here
+            unchanged = False
+        rehashed[path] = dict(entry, hash=file_hash(path) if unchanged else None)
+    return rehashed
+
+def data_signature(data_dir):
+    """Hash the name, mtime and size of every file in a directory, without reading them"""
+    if not os.path.isdir(data_dir):
+        return ""
+    entries = []
+    for entry in os.scandir(data_dir):
+        if entry.is_file():
+            stat = entry.stat()
+            entries.append((entry.name, stat.st_mtime, stat.st_size))
+    return hashlib.sha256(repr(sorted(entries)).encode()).hexdigest()
+
+def scan_data_dir(data_dir):
+    """
+    Hash every file that SimpleDirectoryReader would load from a directory
+
+    Returns:
+        dict: Absolute file path -> content hash
+    """
+    hashes = {}
+    if not os.path.isdir(data_dir):
+        return hashes
+    for entry in os.scandir(data_dir):
+        if entry.is_file() and not entry.name.startswith("."):
+            hashes[os.path.abspath(entry.path)] = file_hash(entry.path)
+    return hashes
+
+def load_manifest(db_dir):
+    """
+    Load the file manifest stored next to the Chroma database
+
+    Returns:
+        dict: Absolute file path -> {"hash", "node_ids"}, empty when missing or
+        when it was written for a different embedding model
+    """
+    manifest_path = os.path.join(db_dir, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return {}
+    try:
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable manifest: {str(e)}")
+        return {}
+    if manifest.get("embed_model") != EMBED_MODEL:
+        return {}
+    files = manifest.get("files", {})
+    algorithm = manifest.get("hash_algorithm", "sha256")
+    if algorithm != HASH_ALGORITHM:
+        files = _rehash_manifest(files, algorithm)
+    return files
+
+def save_manifest(db_dir, files):
+    """Write the file manifest next to the Chroma database"""
+    with open(os.path.join(db_dir, MANIFEST_FILE), "w") as f:
+        json.dump(
+            {"embed_model": EMBED_MODEL, "hash_algorithm": HASH_ALGORITHM, "files": files},
+            f, indent=2
+        )
+
+def diff_manifest(manifest, current_hashes):
+    """
+    Compare the manifest with the files currently in the data directory
+
+    Returns:
+        tuple: (changed_files, stale_node_ids) - files that are new or modified,
+        and node ids belonging to modified or deleted files
+    """
+    changed_files = [
+        path for path, digest in current_hashes.items()
+        if manifest.get(path, {}).get("hash") != digest
+    ]
+    stale_node_ids = [
+        node_id
+        for path, entry in manifest.items()
+        if current_hashes.get(path) != entry.get("hash")
+        for node_id in entry.get("node_ids", [])
+    ]
+    return changed_files, stale_node_ids
+
+def update_manifest(manifest, current_hashes, nodes):
+    """
+    Build the new manifest after the nodes of changed files were inserted
+
+    Args:
+        manifest: Previous manifest
+        current_hashes: Absolute file path -> content hash
+        nodes: Nodes inserted for the changed files
+
+    Returns:
+        dict: Updated manifest
+    """
+    node_ids = {}
+    for node in nodes:
+        path = os.path.abspath(node.metadata.get("file_path", ""))
+        node_ids.setdefault(path, []).append(node.node_id)
+
+    files = {}
+    for path, digest in current_hashes.items():
+        if path in node_ids:
+            files[path] = {"hash": digest, "node_ids": node_ids[path]}
+        elif manifest.get(path, {}).get("hash") == digest:
+            files[path] = manifest[path]
+    return files
+
+class QueryCache:
+    """Two-tier cache of query responses: exact prompt match, then semantic match"""
+
+    def __init__(self, maxsize=512, threshold=0.95):
+        """
+        Initialize the query cache
+
+        Args:
+            maxsize: Maximum number of responses kept in each tier
+            threshold: Cosine similarity above which a previous query counts as a match
+        """
+        self.maxsize = maxsize
+        self.threshold = threshold
+        self._exact = OrderedDict()
+        self._q_embs = None
+        self._q_answers = []
+
+    def _embed(self, query_text):
+        """Embed a query with Gemini and normalize it to unit length"""
+        q_emb = np.asarray(embed_query(query_text), dtype=np.float32)
+        norm = np.linalg.norm(q_emb)
+        return q_emb / norm if norm else q_emb
+
+    def lookup(self, query_text):
+        """
+        Look up a cached response for a query
+
+        Args:
+            query_text: The query text
+
+        Returns:
+            tuple: (response, query_embedding) - response is None on a cache miss,
+            and the embedding can be passed back to store() to avoid re-embedding
+        """
+        if query_text in self._exact:
+            self._exact.move_to_end(query_text)
+            return self._exact[query_text], None
+
+        try:
+            q_emb = self._embed(query_text)
+        except Exception as e:
+            logger.warning(f"Could not embed query for semantic cache: {str(e)}")
+            return None, None
+
+        if self._q_answers:
+            sims = self._q_embs @ q_emb
+            best = int(np.argmax(sims))
+            if sims[best] > self.threshold:
+                logger.info(f"Semantic cache hit (similarity {sims[best]:.3f})")
+                return self._q_answers[best], q_emb
+
+        return None, q_emb
+
+    def store(self, query_text, response, q_emb=None):
+        """
+        Store a response for a query
+
+        Args:
+            query_text: The query text
+            response: Response dict to cache
+            q_emb: Normalized query embedding returned by lookup(), if any
+        """
+        self._exact[query_text] = response
+        self._exact.move_to_end(query_text)
+        if len(self._exact) > self.maxsize:
+            self._exact.popitem(last=False)
+
+        if q_emb is None:
+            return
+
+        if self._q_embs is None:
+            self._q_embs = q_emb[np.newaxis, :]
+        else:
+            self._q_embs = np.vstack([self._q_embs, q_emb])
+        self._q_answers.append(response)
+
+        if len(self._q_answers) > self.maxsize:
+            self._q_embs = self._q_embs[1:]
+            self._q_answers.pop(0)
+
+    def clear(self):
+        """Drop all cached responses, e.g. after the index is rebuilt"""
+        self._exact.clear()
+        self._q_embs = None
+        self._q_answers = []
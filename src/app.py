@@ -8,15 +8,20 @@ import sys
 import os
 
 from src.utils.config import Config
-from src.services.indexing_service import IndexingService
+from src.utils.data_loader import is_nonempty_dir
+from src.services.indexing_service import create_indexing_service
 from src.services.query_service import QueryService
 from src.services.hybrid_query_service import HybridQueryService
-from src.services.knowledge_graph_service import KnowledgeGraphService
+from src.services.knowledge_graph_service import KnowledgeGraphService, graph_visualization_path
+from src.services.feedback_service import FeedbackService
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Characters of each source document shown under "View Sources"
+SOURCE_PREVIEW_CHARS = 200
+
 def init_session_state():
     """Initialize session state variables"""
     if 'messages' not in st.session_state:
@@ -26,6 +31,159 @@ def init_session_state():
     if 'use_graph' not in st.session_state:
         st.session_state.use_graph = False
 
+@st.cache_resource(show_spinner=False)
+def get_index():
+    """
+    Load or create the vector index once per process
+    
+    Streamlit reruns the script on every interaction; caching the index keeps
+    the Chroma client and embedding model from being reopened each time.
+    
+    Returns:
+        VectorStoreIndex or None if it couldn't be loaded or built
+    """
+    return create_indexing_service().get_or_create_index()
+
+@st.cache_resource(show_spinner=False)
+def get_kg_service():
+    """
+    Create the knowledge graph service once per process
+    
+    Loading spaCy and the saved graph is slow, so the sidebar build button
+    and the hybrid query service share one instance.
+    """
+    return KnowledgeGraphService()
+
+@st.cache_resource(show_spinner=False)
+def get_query_service(use_graph: bool, _index):
+    """
+    Create the query service once per process for each mode
+    
+    Args:
+        use_graph: Whether to combine the vector index with the knowledge graph
+        _index: VectorStoreIndex to query (not hashed; clear the cache when it changes)
+    """
+    if use_graph:
+        service = HybridQueryService(vector_index=_index, kg_service=get_kg_service())
+    else:
+        service = QueryService(index=_index)
+    get_created_query_services()[use_graph] = service
+    return service
+
+@st.cache_resource(show_spinner=False)
+def get_created_query_services():
+    """Query services get_query_service has created in this process, by use_graph"""
+    return {}
+
+@st.cache_resource(show_spinner=False)
+def get_feedback_service():
+    """Create the feedback service once per process"""
+    return FeedbackService()
+
+def render_feedback_form(msg_idx, message):
+    """
+    Render the rating form for an assistant message
+    
+    The inputs live in an st.form, so picking a rating or typing a comment
+    doesn't rerun the script; only submitting does. Submitted feedback is
+    remembered on the message so the form isn't shown again.
+    
+    Args:
+        msg_idx: Index of the message in st.session_state.messages
+        message: The assistant message, including the query it answers
+    """
+    if message.get("feedback_submitted"):
+        st.caption("Thank you for your feedback!")
+        return
+        
+    with st.form(key=f"fb_{msg_idx}"):
+        st.write("Was this response helpful?")
+        rating = st.feedback("stars", key=f"rating_{msg_idx}")
+        comment = st.text_area("What could be improved? (optional)", key=f"comment_{msg_idx}")
+        submitted = st.form_submit_button("Submit Feedback")
+        
+    if submitted:
+        if rating is None:
+            st.warning("Please select a rating before submitting.")
+            return
+        # st.feedback returns a 0-based star index
+        sources = [
+            {"metadata": source.get("metadata", {}), "text": source.get("preview", "")}
+            for source in message.get("sources", [])
+        ]
+        response = {"answer": message["content"], "sources": sources}
+        get_feedback_service().save_feedback(message["query"], response, rating + 1, comment or None)
+        message["feedback_submitted"] = True
+        st.success("Thank you for your feedback!")
+
+def normalize_sources(sources):
+    """
+    Replace each source's full text with a short preview, once per message
+    
+    Past messages stay in session state for the whole session, so keeping
+    only previews stops full source chunks from piling up there.
+    
+    Args:
+        sources: Sources returned by the query service
+        
+    Returns:
+        list: The same sources, with "preview" instead of "text"
+    """
+    for source in sources:
+        text = source.pop('text', None) or ''
+        source['preview'] = text[:SOURCE_PREVIEW_CHARS] + "..." if len(text) > SOURCE_PREVIEW_CHARS else text
+    return sources
+
+def to_source_items(sources):
+    """
+    Work out how each source is shown in the "View Sources" expander
+    
+    Called once when a message is added, so reruns only draw the stored
+    items instead of re-reading every source's metadata.
+    
+    Args:
+        sources: Sources processed by normalize_sources
+        
+    Returns:
+        list: Items with a markdown "title" and either a "fact" or a "preview"
+    """
+    items = []
+    for i, source in enumerate(sources, 1):
+        metadata = source.get('metadata', {})
+        source_type = metadata.get('type', 'document')
+        
+        if source_type == 'knowledge_graph':
+            subject = metadata.get('subject', '')
+            predicate = metadata.get('predicate', '')
+            obj = metadata.get('object', '')
+            items.append({
+                "title": f"**Knowledge Graph Fact {i}**",
+                "fact": f"_{subject} {predicate} {obj}_",
+            })
+        else:
+            source_name = metadata.get('source', f"Source {i}")
+            items.append({
+                "title": f"**Document: {source_name}**",
+                "preview": source.get('preview', ''),
+            })
+    return items
+
+def render_sources(source_items):
+    """Draw a message's "View Sources" expander from items made by to_source_items"""
+    with st.expander("View Sources"):
+        for item in source_items:
+            st.markdown(item["title"])
+            if "fact" in item:
+                st.markdown(item["fact"])
+            elif item["preview"]:
+                st.text(item["preview"])
+
+def clear_knowledge_base_cache():
+    """Drop the cached index and query services so they're recreated on next load"""
+    get_index.clear()
+    get_query_service.clear()
+    get_created_query_services().clear()
+
 def load_knowledge_base(use_graph=False):
     """
     Load the knowledge base (vector index and optionally knowledge graph)
@@ -37,18 +195,16 @@ def load_knowledge_base(use_graph=False):
         bool: True if successful, False otherwise
     """
     # Load or create the vector index
-    indexing_service = IndexingService()
-    index = indexing_service.get_or_create_index()
+    index = get_index()
     
     if not index:
+        # Don't keep the failure cached, so the next load tries again
+        get_index.clear()
         st.error("Failed to load or create index. Please ensure you've built the index using build_index.py")
         return False
     
     # Set up the appropriate query service
-    if use_graph:
-        st.session_state.query_service = HybridQueryService(vector_index=index)
-    else:
-        st.session_state.query_service = QueryService(index=index)
+    st.session_state.query_service = get_query_service(use_graph, index)
         
     return True
 
@@ -76,25 +232,24 @@ def main():
                 load_knowledge_base(use_graph=use_graph)
             
         # Check data directory status
-        data_dir_status = "✅ Available" if os.path.exists(Config.DATA_DIR) and os.listdir(Config.DATA_DIR) else "❌ Empty"
+        data_dir_status = "✅ Available" if os.path.exists(Config.DATA_DIR) and is_nonempty_dir(Config.DATA_DIR) else "❌ Empty"
         st.info(f"Data Directory: {data_dir_status}")
         
         # Check index status
-        index_status = "✅ Available" if os.path.exists(Config.CHROMA_DB_DIRECTORY) else "❌ Not Built"
+        index_status = "✅ Available" if os.path.exists(Config.index_directory()) else "❌ Not Built"
         st.info(f"Vector Index: {index_status}")
         
         # Check knowledge graph status
-        visualizations_dir = os.path.join(os.getcwd(), "visualizations")
-        kg_viz_file = os.path.join(visualizations_dir, "knowledge_graph.png")
-        kg_status = "✅ Available" if os.path.exists(kg_viz_file) else "❌ Not Built"
+        kg_status = "✅ Available" if os.path.exists(Config.KNOWLEDGE_GRAPH_FILE) else "❌ Not Built"
         st.info(f"Knowledge Graph: {kg_status}")
         
         # Build index button
         if st.button("Build/Rebuild Vector Index"):
             with st.spinner("Building vector index..."):
                 try:
-                    indexing_service = IndexingService()
+                    indexing_service = create_indexing_service()
                     index = indexing_service.build_index()
+                    clear_knowledge_base_cache()
                     if index:
                         st.success("Vector index built successfully")
                         # Update the query service with the new index
@@ -108,27 +263,32 @@ def main():
         if st.button("Build/Rebuild Knowledge Graph"):
             with st.spinner("Building knowledge graph..."):
                 try:
-                    kg_service = KnowledgeGraphService()
-                    success = kg_service.build_graph_from_documents()
+                    # Rebuilt in place; the hybrid query service shares this instance
+                    success = get_kg_service().build_graph_from_documents()
+                    # Cached answers may rely on facts from the previous graph. The hybrid service is
+                    # shared process-wide, so clear it even if this session is in vector-only mode
+                    hybrid_service = get_created_query_services().get(True)
+                    if hybrid_service:
+                        hybrid_service.clear_cache()
                     if success:
                         st.success("Knowledge graph built successfully")
                         # If using graph, reload the query service
                         if st.session_state.use_graph:
                             load_knowledge_base(use_graph=True)
-                            
-                        # Show visualization if available
-                        viz_path = os.path.join(os.getcwd(), "visualizations", "knowledge_graph.png")
-                        if os.path.exists(viz_path):
-                            st.image(viz_path, caption="Knowledge Graph Visualization")
                     else:
                         st.error("Failed to build knowledge graph")
                 except Exception as e:
                     st.error(f"Error building knowledge graph: {str(e)}")
                     
-        # Show knowledge graph visualization if available
-        if os.path.exists(kg_viz_file):
+        # Show knowledge graph visualization; laying out a large graph is slow, so it's only rendered on request
+        if os.path.exists(Config.KNOWLEDGE_GRAPH_FILE):
             with st.expander("View Knowledge Graph"):
-                st.image(kg_viz_file, caption="Knowledge Graph Visualization")
+                kg_viz_file = graph_visualization_path()
+                if not kg_viz_file and st.button("Render Knowledge Graph"):
+                    with st.spinner("Rendering knowledge graph..."):
+                        kg_viz_file = get_kg_service().get_graph_visualization()
+                if kg_viz_file:
+                    st.image(kg_viz_file, caption="Knowledge Graph Visualization")
     
     # Main content
     st.title("🤖 Chatbot")
@@ -145,29 +305,17 @@ def main():
                 st.stop()
     
     # Display chat messages
-    for message in st.session_state.messages:
+    for msg_idx, message in enumerate(st.session_state.messages):
         with st.chat_message(message["role"]):
             st.markdown(message["content"])
             
             # Show sources if available
-            if message["role"] == "assistant" and "sources" in message:
-                with st.expander("View Sources"):
-                    for i, source in enumerate(message["sources"], 1):
-                        metadata = source.get('metadata', {})
-                        source_type = metadata.get('type', 'document')
-                        
-                        if source_type == 'knowledge_graph':
-                            subject = metadata.get('subject', '')
-                            predicate = metadata.get('predicate', '')
-                            obj = metadata.get('object', '')
-                            st.markdown(f"**Knowledge Graph Fact {i}**")
-                            st.markdown(f"_{subject} {predicate} {obj}_")
-                        else:
-                            source_name = metadata.get('source', f"Source {i}")
-                            st.markdown(f"**Document: {source_name}**")
-                            text = source.get('text', '')
-                            if text:
-                                st.text(text[:200] + "..." if len(text) > 200 else text)
+            if message.get("source_items"):
+                render_sources(message["source_items"])
+                                
+            # Collect feedback on answers
+            if message["role"] == "assistant" and "query" in message:
+                render_feedback_form(msg_idx, message)
     
     # Chat input
     if prompt := st.chat_input("Ask me anything..."):
@@ -180,58 +328,45 @@ def main():
             with st.chat_message("assistant"):
                 message_placeholder = st.empty()
                 with st.spinner("Thinking..."):
+                    # Shown once an LLM call times out and is retried
+                    retry_status = []
+                    
+                    def show_retry(attempt, delay):
+                        label = f"Still waiting for an answer, retrying ({attempt}/{Config.QUERY_RETRIES})..."
+                        if retry_status:
+                            retry_status[0].update(label=label)
+                        else:
+                            retry_status.append(st.status(label))
+                            
                     try:
-                        response = st.session_state.query_service.query(prompt)
-                        message_placeholder.markdown(response["answer"])
+                        # Render the answer token by token as the LLM generates it
+                        response = {"answer": "", "sources": []}
+                        response["answer"] = message_placeholder.write_stream(
+                            st.session_state.query_service.query_stream(prompt, response, on_retry=show_retry)
+                        )
+                        if retry_status:
+                            if response.get("error"):
+                                retry_status[0].update(label="No answer after retrying", state="error")
+                            else:
+                                retry_status[0].update(label="Answered after retrying", state="complete")
                         
                         # Add assistant message to chat history
-                        st.session_state.messages.append({
+                        sources = normalize_sources(response["sources"])
+                        message = {
                             "role": "assistant", 
                             "content": response["answer"],
-                            "sources": response["sources"]
-                        })
+                            "sources": sources,
+                            "source_items": to_source_items(sources),
+                            "query": prompt
+                        }
+                        st.session_state.messages.append(message)
                         
                         # Show sources if available
-                        if response["sources"]:
-                            with st.expander("View Sources"):
-                                for i, source in enumerate(response["sources"], 1):
-                                    metadata = source.get('metadata', {})
-                                    source_type = metadata.get('type', 'document')
-                                    
-                                    if source_type == 'knowledge_graph':
-                                        subject = metadata.get('subject', '')
-                                        predicate = metadata.get('predicate', '')
-                                        obj = metadata.get('object', '')
-                                        st.markdown(f"**Knowledge Graph Fact {i}**")
-                                        st.markdown(f"_{subject} {predicate} {obj}_")
-                                    else:
-                                        source_name = metadata.get('source', f"Source {i}")
-                                        st.markdown(f"**Document: {source_name}**")
-                                        text = source.get('text', '')
-                                        if text:
-                                            st.text(text[:200] + "..." if len(text) > 200 else text)
+                        if message["source_items"]:
+                            render_sources(message["source_items"])
                         
                         # Add feedback UI
-                        st.write("Was this response helpful?")
-                        feedback_cols = st.columns([1, 1, 1, 1, 1, 3])
-                        
-                        # Import feedback service if we need to collect feedback
-                        from src.services.feedback_service import FeedbackService
-                        feedback_service = FeedbackService()
-                        
-                        # Add rating buttons
-                        for i, col in enumerate(feedback_cols[:5], 1):
-                            if col.button(f"{i} ⭐", key=f"rating_{i}_{len(st.session_state.messages)}"):
-                                # Collect optional comment if rating is low
-                                if i <= 3:
-                                    comment = st.text_input("What could be improved? (optional)", key=f"comment_{len(st.session_state.messages)}")
-                                    if st.button("Submit Feedback", key=f"submit_{len(st.session_state.messages)}"):
-                                        feedback_service.save_feedback(prompt, response, i, comment)
-                                        st.success("Thank you for your feedback!")
-                                else:
-                                    # For high ratings, just save without comment
-                                    feedback_service.save_feedback(prompt, response, i, None)
-                                    st.success("Thank you for your feedback!")
+                        render_feedback_form(len(st.session_state.messages) - 1, message)
                                     
                     except Exception as e:
                         st.error(f"Error: {str(e)}")
@@ -3,19 +3,23 @@
 Script to automatically fetch and update content from a website
 """
 import argparse
+import asyncio
+import gc
 import logging
 import sys
 import os
-import requests
-from bs4 import BeautifulSoup
+import httpx
+from selectolax.lexbor import LexborHTMLParser
 import time
-import hashlib
+import xxhash
 from datetime import datetime
+from apscheduler.schedulers.blocking import BlockingScheduler
 import json
-from urllib.parse import urljoin, urlparse
+import sqlite3
+from urllib.parse import urldefrag, urljoin, urlparse
 
 from src.utils.config import Config
-from src.services.indexing_service import IndexingService
+from src.services.indexing_service import create_indexing_service, get_embed_model
 from src.services.knowledge_graph_service import KnowledgeGraphService
 
 # Configure logging
@@ -29,6 +33,42 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Browser-like headers sent with every request
+REQUEST_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
+
+# Elements removed from pages before extracting their text
+DROP_TAGS = ("script", "style", "noscript", "svg")
+DROP_SELECTOR = ", ".join(DROP_TAGS)
+
+# Links to files with these extensions aren't crawled; they aren't HTML pages
+SKIP_EXTENSIONS = {
+    '.pdf', '.zip', '.gz', '.tar', '.png', '.jpg', '.jpeg', '.gif', '.svg',
+    '.mp4', '.mp3', '.ico', '.css', '.js', '.woff', '.woff2',
+}
+
+# Content hashes and HTTP validators of saved pages, kept in the cache directory
+HASH_DB_FILE = "hashes.db"
+
+# Columns added to the hashes table after it was first created
+HASH_DB_COLUMNS = {"etag": "TEXT", "last_modified": "TEXT", "links": "TEXT"}
+
+# Maximum number of pages fetched at the same time, across all websites
+MAX_CONCURRENT_REQUESTS = 16
+
+# Connection pool shared by all requests; idle connections are kept alive for reuse
+CONNECTION_LIMITS = httpx.Limits(max_connections=32, max_keepalive_connections=16)
+
+# Attempts per scheduled update before waiting for the next run, with exponential backoff
+UPDATE_ATTEMPTS = 3
+UPDATE_RETRY_BACKOFF_S = 60
+
+# Retries for failed connections and 429 / 5xx responses, with exponential backoff
+MAX_RETRIES = 3
+RETRY_BACKOFF_S = 0.2
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
 class ContentUpdater:
     """Service to fetch and update content from websites"""
     
@@ -43,6 +83,9 @@ class ContentUpdater:
         self.data_dir = Config.DATA_DIR
         self.cache_dir = os.path.join(os.getcwd(), ".content_cache")
         
+        # Per-website settings, keyed by website name; rebuilt on each update
+        self._site_ctx = {}
+        
         # Create directories if they don't exist
         if not os.path.exists(self.data_dir):
             os.makedirs(self.data_dir)
@@ -50,6 +93,19 @@ class ContentUpdater:
         if not os.path.exists(self.cache_dir):
             os.makedirs(self.cache_dir)
             
+        # One database of content hashes instead of a .hash file per page
+        self.hash_db = sqlite3.connect(os.path.join(self.cache_dir, HASH_DB_FILE))
+        self.hash_db.execute(
+            "CREATE TABLE IF NOT EXISTS hashes (key TEXT PRIMARY KEY, hash TEXT, ts INTEGER)"
+        )
+        existing_columns = {row[1] for row in self.hash_db.execute("PRAGMA table_info(hashes)")}
+        for column, column_type in HASH_DB_COLUMNS.items():
+            if column not in existing_columns:
+                self.hash_db.execute(f"ALTER TABLE hashes ADD COLUMN {column} {column_type}")
+        # Update state, such as when the knowledge graph was last built
+        self.hash_db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.hash_db.commit()
+            
     def load_config(self):
         """
         Load website configuration
@@ -88,175 +144,335 @@ class ContentUpdater:
             logger.error(f"Error loading config: {str(e)}")
             return {"websites": [], "update_frequency_hours": 24}
             
-    def get_page_content(self, url, css_selector=None):
+    def _build_site_context(self, website_config):
         """
-        Get content from a webpage
+        Read a website's settings once per update instead of once per page
         
         Args:
-            url: URL to fetch
-            css_selector: CSS selector to extract specific content (optional)
+            website_config: Configuration for the website
             
         Returns:
-            tuple: (content, success)
+            dict: name, base_url, paths, selector, max_pages, follow_links and base_netloc
         """
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+        base_url = website_config.get("base_url")
+        return {
+            "name": website_config.get("name", "unnamed"),
+            "base_url": base_url,
+            "paths": website_config.get("paths", ["/"]),
+            "selector": website_config.get("css_selector"),
+            "max_pages": website_config.get("max_pages", 10),
+            "follow_links": website_config.get("follow_links", False),
+            "base_netloc": urlparse(base_url).netloc,
         }
         
-        try:
-            response = requests.get(url, headers=headers, timeout=10)
-            response.raise_for_status()
+    def _parse_page(self, html, url, site_ctx):
+        """
+        Parse a webpage once and extract its readable text
+        
+        Args:
+            html: HTML content
+            url: URL the page was fetched from
+            site_ctx: Website settings from _build_site_context
+            
+        Returns:
+            tuple: (content, tree) - Markdown content with the page title and URL,
+            and the parsed page for link extraction
+        """
+        tree = LexborHTMLParser(html)
+        
+        # Remove script, style and other non-text elements
+        for node in tree.css(DROP_SELECTOR):
+            node.decompose()
             
-            soup = BeautifulSoup(response.text, 'html.parser')
+        # Extract content using selector, falling back to the body if it doesn't match
+        content_elements = tree.css(site_ctx["selector"]) if site_ctx["selector"] else []
+        if not content_elements and tree.body is not None:
+            content_elements = [tree.body]
+        content = "\n\n".join([elem.text(separator="\n").strip() for elem in content_elements])
+            
+        # Add title
+        title_node = tree.css_first("title")
+        title = title_node.text() if title_node is not None else url
+        return f"# {title}\n\nURL: {url}\n\n{content}", tree
+        
+    async def get_page_content(self, client, url, site_ctx, cached_page=None):
+        """
+        Get content from a webpage
+        
+        When the page was saved before, the request is conditional on its
+        ETag / Last-Modified, so an unchanged page answers 304 without a body.
+        
+        Args:
+            client: httpx.AsyncClient used for the request
+            url: URL to fetch
+            site_ctx: Website settings from _build_site_context
+            cached_page: Row saved for the page by a previous update (optional)
             
-            # Remove script and style elements
-            for script in soup(["script", "style"]):
-                script.extract()
+        Returns:
+            tuple: (content, tree, validators, success) - content and tree are None
+            when the page wasn't modified; validators holds the response's
+            "etag" and "last_modified" headers
+        """
+        headers = {}
+        if cached_page is not None:
+            if cached_page["etag"]:
+                headers["If-None-Match"] = cached_page["etag"]
+            if cached_page["last_modified"]:
+                headers["If-Modified-Since"] = cached_page["last_modified"]
                 
-            if css_selector:
-                # Extract content using selector
-                content_elements = soup.select(css_selector)
-                if content_elements:
-                    content = "\n\n".join([elem.get_text(separator="\n").strip() for elem in content_elements])
+        try:
+            for attempt in range(MAX_RETRIES + 1):
+                try:
+                    response = await client.get(url, headers=headers)
+                except httpx.TransportError:
+                    if attempt == MAX_RETRIES:
+                        raise
                 else:
-                    # Fallback to body if selector doesn't match
-                    content = soup.body.get_text(separator="\n").strip()
-            else:
-                # Get all text from body
-                content = soup.body.get_text(separator="\n").strip()
+                    if response.status_code not in RETRY_STATUS_CODES or attempt == MAX_RETRIES:
+                        break
+                await asyncio.sleep(RETRY_BACKOFF_S * 2 ** attempt)
                 
-            # Add title
-            title = soup.title.string if soup.title else url
-            content = f"# {title}\n\nURL: {url}\n\n{content}"
+            if response.status_code == 304:
+                return None, None, None, True
+            response.raise_for_status()
+            validators = {
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+            }
             
-            return content, True
+            # Parsing is CPU-bound, so keep it off the event loop
+            content, tree = await asyncio.to_thread(self._parse_page, response.text, url, site_ctx)
+            return content, tree, validators, True
         except Exception as e:
             logger.error(f"Error fetching {url}: {str(e)}")
-            return f"Error fetching {url}: {str(e)}", False
+            return f"Error fetching {url}: {str(e)}", None, None, False
             
-    def extract_links(self, url, html_content, base_url):
+    def extract_links(self, url, tree, base_netloc):
         """
-        Extract links from HTML content
+        Extract links from a parsed page
         
         Args:
             url: Current URL
-            html_content: HTML content
-            base_url: Base URL for the website
+            tree: Page parsed by get_page_content
+            base_netloc: Network location of the website's base URL
             
         Returns:
-            list: Extracted links
+            list: Extracted links to HTML pages, without fragments
         """
-        soup = BeautifulSoup(html_content, 'html.parser')
         links = []
         
-        for a_tag in soup.find_all('a', href=True):
-            href = a_tag['href']
-            absolute_url = urljoin(url, href)
+        for a_tag in tree.css('a[href]'):
+            href = a_tag.attributes['href'] or ''
+            absolute_url = urldefrag(urljoin(url, href)).url
+            parsed = urlparse(absolute_url)
             
+            # Skip mailto:/tel: links and files that aren't pages
+            if parsed.scheme not in ('http', 'https'):
+                continue
+            if os.path.splitext(parsed.path)[1].lower() in SKIP_EXTENSIONS:
+                continue
+                
             # Check if link is within the same domain
-            if urlparse(absolute_url).netloc == urlparse(base_url).netloc:
+            if parsed.netloc == base_netloc:
                 links.append(absolute_url)
                 
         return links
         
     def get_content_hash(self, content):
-        """Generate hash for content to detect changes"""
-        return hashlib.md5(content.encode()).hexdigest()
+        """Generate hash for content to detect changes (not for security, so a fast non-cryptographic hash)"""
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        return xxhash.xxh3_64_hexdigest(content)
+        
+    def _page_key(self, name, url):
+        """Name of a page's file in the data directory (without .md) and its key in the hash database"""
+        # Generate filename
+        parsed_url = urlparse(url)
+        path = parsed_url.path
+        if path.endswith('/'):
+            path += 'index'
+            
+        # Clean path for filename
+        path = path.replace('/', '_').strip('_')
+        if not path:
+            path = 'index'
+            
+        return f"{name}_{path}"
+        
+    def _get_cached_page(self, key):
+        """
+        Look up what the last update saved for a page
         
-    def update_website_content(self, website_config):
+        Returns:
+            dict: hash, ts, etag, last_modified and links (JSON list), or None if never saved
+        """
+        row = self.hash_db.execute(
+            "SELECT hash, ts, etag, last_modified, links FROM hashes WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("hash", "ts", "etag", "last_modified", "links"), row))
+        
+    def _save_page(self, key, url, content, cached_page, validators, links):
+        """
+        Save a page's content if it changed since the last update
+        
+        Args:
+            key: Page key from _page_key
+            url: URL the content was fetched from
+            content: Page content
+            cached_page: Row saved for the page by a previous update, or None
+            validators: ETag / Last-Modified returned with the content
+            links: Links found on the page, reused when it later answers 304
+            
+        Returns:
+            bool: True if the content was written, False if unchanged
+        """
+        filepath = os.path.join(self.data_dir, f"{key}.md")
+        
+        # Check cache to see if content changed
+        data = content.encode('utf-8')
+        content_hash = self.get_content_hash(data)
+        changed = cached_page is None or cached_page["hash"] != content_hash
+        
+        if changed:
+            # Save content atomically, via a hidden temp file the document loaders skip
+            tmp_path = os.path.join(self.data_dir, f".{key}.md.part")
+            with open(tmp_path, 'wb', buffering=1 << 20) as f:
+                f.write(data)
+            os.replace(tmp_path, filepath)
+            logger.info(f"Updated: {filepath}")
+        else:
+            logger.info(f"Content unchanged for {url}")
+            
+        # Update cache (committed once per website)
+        self.hash_db.execute(
+            "INSERT OR REPLACE INTO hashes (key, hash, ts, etag, last_modified, links) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                key,
+                content_hash,
+                int(time.time()) if changed else cached_page["ts"],
+                validators["etag"],
+                validators["last_modified"],
+                json.dumps(links) if links is not None else None,
+            )
+        )
+        return changed
+        
+    async def update_website_content(self, site_ctx, client, semaphore):
         """
         Update content for a specific website
         
+        Pages are fetched by MAX_CONCURRENT_REQUESTS workers sharing one queue,
+        so network round trips overlap instead of running one after another.
+        
         Args:
-            website_config: Configuration for the website
+            site_ctx: Website settings from _build_site_context
+            client: httpx.AsyncClient shared by all websites
+            semaphore: asyncio.Semaphore bounding concurrent requests across websites
             
         Returns:
             tuple: (updated_count, error_count)
         """
-        name = website_config.get("name", "unnamed")
-        base_url = website_config.get("base_url")
-        paths = website_config.get("paths", ["/"])
-        css_selector = website_config.get("css_selector")
-        max_pages = website_config.get("max_pages", 10)
-        follow_links = website_config.get("follow_links", False)
+        name = site_ctx["name"]
+        base_url = site_ctx["base_url"]
+        max_pages = site_ctx["max_pages"]
+        follow_links = site_ctx["follow_links"]
         
         logger.info(f"Updating content for {name} ({base_url})")
         
         updated_count = 0
         error_count = 0
         visited_urls = set()
-        urls_to_visit = [urljoin(base_url, path) for path in paths]
-        
-        while urls_to_visit and len(visited_urls) < max_pages:
-            url = urls_to_visit.pop(0)
-            
-            if url in visited_urls:
-                continue
-                
-            visited_urls.add(url)
-            logger.info(f"Fetching: {url}")
-            
-            # Get content
-            content, success = self.get_page_content(url, css_selector)
-            
-            if not success:
-                error_count += 1
-                continue
-                
-            # Generate filename
-            parsed_url = urlparse(url)
-            path = parsed_url.path
-            if path.endswith('/'):
-                path += 'index'
-                
-            # Clean path for filename
-            path = path.replace('/', '_').strip('_')
-            if not path:
-                path = 'index'
-                
-            filename = f"{name}_{path}.md"
-            filepath = os.path.join(self.data_dir, filename)
-            
-            # Check cache to see if content changed
-            content_hash = self.get_content_hash(content)
-            cache_file = os.path.join(self.cache_dir, f"{name}_{path}.hash")
-            
-            if os.path.exists(cache_file):
-                with open(cache_file, 'r') as f:
-                    old_hash = f.read().strip()
-                    
-                if old_hash == content_hash:
-                    logger.info(f"Content unchanged for {url}")
-                    continue
-            
-            # Save content
-            with open(filepath, 'w') as f:
-                f.write(content)
-                
-            # Update cache
-            with open(cache_file, 'w') as f:
-                f.write(content_hash)
+        enqueued_urls = set()
+        urls_to_visit = asyncio.Queue()
+        for path in site_ctx["paths"]:
+            url = urljoin(base_url, path)
+            if url not in enqueued_urls:
+                enqueued_urls.add(url)
+                urls_to_visit.put_nowait(url)
                 
-            updated_count += 1
-            logger.info(f"Updated: {filepath}")
-            
-            # Extract links if needed
-            if follow_links and len(visited_urls) < max_pages:
+        async def worker():
+            nonlocal updated_count, error_count
+            while True:
+                url = await urls_to_visit.get()
                 try:
-                    response = requests.get(url, timeout=10)
-                    new_links = self.extract_links(url, response.text, base_url)
+                    if url in visited_urls or len(visited_urls) >= max_pages:
+                        continue
+                        
+                    visited_urls.add(url)
+                    logger.info(f"Fetching: {url}")
                     
-                    # Add new links to visit
-                    for link in new_links:
-                        if link not in visited_urls and link not in urls_to_visit:
-                            urls_to_visit.append(link)
+                    # Get content
+                    key = self._page_key(name, url)
+                    cached_page = self._get_cached_page(key)
+                    async with semaphore:
+                        content, tree, validators, success = await self.get_page_content(
+                            client, url, site_ctx, cached_page
+                        )
+                        
+                    if not success:
+                        error_count += 1
+                        continue
+                        
+                    new_links = None
+                    if content is None:
+                        # Not modified; follow the links saved with the page
+                        logger.info(f"Content not modified for {url}")
+                        if cached_page["links"]:
+                            new_links = json.loads(cached_page["links"])
+                    else:
+                        # Extract links from the page already fetched and parsed
+                        if follow_links:
+                            try:
+                                new_links = self.extract_links(url, tree, site_ctx["base_netloc"])
+                            except Exception as e:
+                                logger.error(f"Error extracting links from {url}: {str(e)}")
+                                
+                        if self._save_page(key, url, content, cached_page, validators, new_links):
+                            updated_count += 1
                             
+                    # Add new links to visit
+                    if follow_links and new_links and len(visited_urls) < max_pages:
+                        for link in new_links:
+                            if link not in enqueued_urls:
+                                enqueued_urls.add(link)
+                                urls_to_visit.put_nowait(link)
                 except Exception as e:
-                    logger.error(f"Error extracting links from {url}: {str(e)}")
+                    # Keep the worker alive; if every worker died, join() would wait forever
+                    logger.error(f"Error processing {url}: {str(e)}")
+                    error_count += 1
+                finally:
+                    urls_to_visit.task_done()
                     
+        workers = [asyncio.create_task(worker()) for _ in range(MAX_CONCURRENT_REQUESTS)]
+        try:
+            await urls_to_visit.join()
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            self.hash_db.commit()
+            
         logger.info(f"Finished updating {name}: {updated_count} pages updated, {error_count} errors")
         return updated_count, error_count
         
+    async def _update_all(self):
+        """Update all websites concurrently over one connection pool"""
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        async with httpx.AsyncClient(
+            http2=True,
+            headers=REQUEST_HEADERS,
+            timeout=10,
+            follow_redirects=True,
+            limits=CONNECTION_LIMITS,
+        ) as client:
+            return await asyncio.gather(*[
+                self.update_website_content(site_ctx, client, semaphore)
+                for site_ctx in self._site_ctx.values()
+            ])
+            
     def run_update(self):
         """
         Run the content update process for all websites
@@ -271,41 +487,135 @@ class ContentUpdater:
             logger.warning("No websites configured for updates")
             return 0, 0
             
-        total_updated = 0
-        total_errors = 0
-        
+        self._site_ctx.clear()
         for website in websites:
-            updated, errors = self.update_website_content(website)
-            total_updated += updated
-            total_errors += errors
+            site_ctx = self._build_site_context(website)
+            self._site_ctx[site_ctx["name"]] = site_ctx
+            
+        results = asyncio.run(self._update_all())
+        total_updated = sum(updated for updated, _ in results)
+        total_errors = sum(errors for _, errors in results)
             
         logger.info(f"Update completed: {total_updated} pages updated, {total_errors} errors")
         
         return total_updated, total_errors
         
+    def _get_meta(self, key):
+        """Read a value from the update state table, or None if unset"""
+        row = self.hash_db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+        
+    def _set_meta(self, key, value):
+        """Write a value to the update state table"""
+        self.hash_db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+        self.hash_db.commit()
+        
+    def _changed_paths_since(self, timestamp):
+        """
+        Paths of the pages whose content changed at or after a timestamp
+        
+        Args:
+            timestamp: Unix time in seconds
+            
+        Returns:
+            list: Paths of the changed page files that still exist
+        """
+        rows = self.hash_db.execute("SELECT key FROM hashes WHERE ts >= ?", (timestamp,)).fetchall()
+        paths = [os.path.join(self.data_dir, f"{key}.md") for (key,) in rows]
+        return [path for path in paths if os.path.exists(path)]
+        
     def rebuild_indexes(self):
-        """Rebuild vector index and knowledge graph if content was updated"""
+        """
+        Rebuild vector index and update the knowledge graph if content was updated
+        
+        The knowledge graph is built in full only the first time; afterwards
+        just the pages changed since kg_last_built_at are re-extracted, and
+        relations from files no longer in the data directory are dropped.
+        
+        Returns:
+            bool: True if both were rebuilt, False otherwise
+        """
         logger.info("Rebuilding indexes...")
+        started_at = int(time.time())
         
         try:
             # Rebuild vector index
-            indexing_service = IndexingService()
+            indexing_service = create_indexing_service()
             index = indexing_service.build_index()
             if index:
                 logger.info("Vector index rebuilt successfully")
             else:
                 logger.error("Failed to rebuild vector index")
                 
-            # Rebuild knowledge graph
+            # Update knowledge graph
             kg_service = KnowledgeGraphService()
-            success = kg_service.build_graph_from_documents()
+            kg_last_built_at = self._get_meta("kg_last_built_at")
+            if kg_last_built_at is None or not os.path.exists(Config.KNOWLEDGE_GRAPH_FILE):
+                success = kg_service.build_graph_from_documents(self.data_dir)
+            else:
+                changed_paths = self._changed_paths_since(int(kg_last_built_at))
+                with os.scandir(self.data_dir) as entries:
+                    present = {entry.name for entry in entries if entry.is_file()}
+                removed_sources = sorted(kg_service.graph_sources() - present)
+                if changed_paths or removed_sources:
+                    success = kg_service.incremental_update(changed_paths, removed_sources)
+                else:
+                    logger.info("No content changed since the knowledge graph was last built")
+                    success = True
+                    
             if success:
-                logger.info("Knowledge graph rebuilt successfully")
+                self._set_meta("kg_last_built_at", started_at)
+                logger.info("Knowledge graph updated successfully")
             else:
-                logger.error("Failed to rebuild knowledge graph")
+                logger.error("Failed to update knowledge graph")
                 
+            return bool(index) and success
         except Exception as e:
             logger.error(f"Error rebuilding indexes: {str(e)}")
+            return False
+            
+    def close(self):
+        """Close the hash database"""
+        self.hash_db.close()
+
+def run_scheduled_update(config_file, rebuild):
+    """
+    Run one daemon update, retrying with exponential backoff when it fails
+    
+    The updater, its hash database and the embedding model only live for
+    the duration of the run, so the daemon holds no heavy resources while
+    it waits for the next one.
+    
+    Args:
+        config_file: Path to config file with website URLs
+        rebuild: Rebuild indexes after content was updated
+    """
+    needs_rebuild = False
+    for attempt in range(1, UPDATE_ATTEMPTS + 1):
+        updater = None
+        try:
+            updater = ContentUpdater(config_file=config_file)
+            total_updated, _ = updater.run_update()
+            needs_rebuild = needs_rebuild or (total_updated > 0 and rebuild)
+            
+            # Rebuild indexes if content was updated
+            if needs_rebuild and not updater.rebuild_indexes():
+                raise RuntimeError("Index rebuild failed")
+            return
+        except Exception as e:
+            logger.error(f"Scheduled update failed (attempt {attempt}/{UPDATE_ATTEMPTS}): {str(e)}")
+        finally:
+            if updater is not None:
+                updater.close()
+            get_embed_model.cache_clear()
+            gc.collect()
+            
+        if attempt < UPDATE_ATTEMPTS:
+            delay = UPDATE_RETRY_BACKOFF_S * 2 ** (attempt - 1)
+            logger.info(f"Retrying update in {delay} seconds")
+            time.sleep(delay)
+            
+    logger.error("Giving up on this update; it will run again at the next scheduled time")
 
 def main():
     parser = argparse.ArgumentParser(description="Update content from websites")
@@ -317,31 +627,34 @@ def main():
                         help="Run as a daemon that periodically updates content")
     args = parser.parse_args()
     
-    updater = ContentUpdater(config_file=args.config)
-    
     if args.daemon:
         logger.info("Starting content updater daemon")
-        config = updater.load_config()
-        update_frequency = config.get("update_frequency_hours", 24)
+        updater = ContentUpdater(config_file=args.config)
+        update_frequency = updater.load_config().get("update_frequency_hours", 24)
+        updater.close()
         
-        while True:
-            # Run update
+        # Run now and then every update_frequency hours; a run that overlaps the next is skipped
+        scheduler = BlockingScheduler()
+        scheduler.add_job(
+            run_scheduled_update,
+            "interval",
+            args=[args.config, args.rebuild],
+            hours=update_frequency,
+            next_run_time=datetime.now(),
+            max_instances=1,
+            coalesce=True,
+        )
+        scheduler.start()
+    else:
+        # Run once
+        updater = ContentUpdater(config_file=args.config)
+        try:
             total_updated, _ = updater.run_update()
             
-            # Rebuild indexes if content was updated
             if total_updated > 0 and args.rebuild:
                 updater.rebuild_indexes()
-                
-            # Sleep until next update
-            next_update = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            logger.info(f"Next update scheduled at: {next_update}")
-            time.sleep(update_frequency * 3600)  # Convert hours to seconds
-    else:
-        # Run once
-        total_updated, _ = updater.run_update()
-        
-        if total_updated > 0 and args.rebuild:
-            updater.rebuild_indexes()
+        finally:
+            updater.close()
 
 if __name__ == "__main__":
     main()
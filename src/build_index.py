@@ -8,7 +8,8 @@ import sys
 import os
 
 from src.utils.config import Config
-from src.services.indexing_service import IndexingService
+from src.utils.data_loader import is_nonempty_dir
+from src.services.indexing_service import create_indexing_service
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -26,7 +27,7 @@ def main():
         sys.exit(1)
         
     # Check if data directory contains files
-    if not os.listdir(args.data_dir):
+    if not is_nonempty_dir(args.data_dir):
         logger.error(f"Data directory '{args.data_dir}' is empty. Please add documents first.")
         sys.exit(1)
     
@@ -38,11 +39,11 @@ def main():
     logger.info(f"Building index from documents in {args.data_dir}")
     
     # Build index
-    indexing_service = IndexingService()
+    indexing_service = create_indexing_service()
     index = indexing_service.build_index(documents_dir=args.data_dir)
     
     if index:
-        logger.info(f"Index built successfully and stored in {Config.CHROMA_DB_DIRECTORY}")
+        logger.info(f"Index built successfully and stored in {Config.index_directory()}")
     else:
         logger.error("Failed to build index")
         sys.exit(1)
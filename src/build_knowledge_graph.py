@@ -8,6 +8,7 @@ import sys
 import os
 
 from src.utils.config import Config
+from src.utils.data_loader import is_nonempty_dir
 from src.services.knowledge_graph_service import KnowledgeGraphService
 
 logging.basicConfig(level=logging.INFO)
@@ -26,7 +27,7 @@ def main():
         sys.exit(1)
         
     # Check if data directory contains files
-    if not os.listdir(args.data_dir):
+    if not is_nonempty_dir(args.data_dir):
         logger.error(f"Data directory '{args.data_dir}' is empty. Please add documents first.")
         sys.exit(1)
     
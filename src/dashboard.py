@@ -4,19 +4,18 @@ Streamlit dashboard for monitoring chatbot performance and feedback
 """
 import streamlit as st
 import pandas as pd
-import json
+import orjson
 import os
 import sys
-import matplotlib.pyplot as plt
-import seaborn as sns
+import threading
 from datetime import datetime, timedelta
-from collections import Counter
-import networkx as nx
-import altair as alt
 
-from src.services.feedback_service import FeedbackService
+from src.services.feedback_service import FAILED_RATING, FeedbackService
 from src.utils.config import Config
 
+# Text columns stored as categoricals when fewer than this share of their values are distinct
+CATEGORICAL_MAX_UNIQUE_RATIO = 0.5
+
 # Configure page
 st.set_page_config(
     page_title="Chatbot Analytics Dashboard",
@@ -24,22 +23,42 @@ st.set_page_config(
     layout="wide"
 )
 
-def load_feedback_data():
-    """Load feedback data from JSONL file"""
-    feedback_file = os.path.join(os.getcwd(), "feedback", "feedback.jsonl")
+@st.cache_data(show_spinner=False, max_entries=1)
+def _parse_feedback_file(feedback_file, mtime, size):
+    """
+    Parse the feedback JSONL file into a DataFrame
     
-    if not os.path.exists(feedback_file):
-        st.warning("No feedback data available yet. Use the chatbot to generate feedback.")
+    mtime and size are only cache keys: appending feedback changes them,
+    so reruns reuse the parsed DataFrame until the file grows.
+    """
+    if size == 0:
         return pd.DataFrame()
         
-    # Load data
+    try:
+        df = pd.read_json(feedback_file, lines=True, convert_dates=['timestamp'])
+    except ValueError:
+        # A corrupt line fails the whole read; parse line by line, skipping bad lines
+        df = _parse_feedback_lines(feedback_file)
+        
+    if 'rating' in df.columns:
+        df['rating'] = df['rating'].astype('int8')
+        
+    # Repeated queries, answers and comments are stored once per distinct value
+    for column in ('query', 'response', 'comment'):
+        if column in df.columns and df[column].nunique() < CATEGORICAL_MAX_UNIQUE_RATIO * len(df):
+            df[column] = df[column].astype('category')
+            
+    return df
+
+def _parse_feedback_lines(feedback_file):
+    """Parse the feedback file line by line, skipping lines that aren't valid JSON"""
     data = []
-    with open(feedback_file, 'r') as f:
+    with open(feedback_file, 'rb') as f:
         for line in f:
             try:
-                entry = json.loads(line.strip())
+                entry = orjson.loads(line)
                 data.append(entry)
-            except json.JSONDecodeError:
+            except orjson.JSONDecodeError:
                 continue
                 
     if not data:
@@ -54,12 +73,69 @@ def load_feedback_data():
         
     return df
 
+def load_feedback_data():
+    """Load feedback data from JSONL file"""
+    feedback_file = os.path.join(os.getcwd(), "feedback", "feedback.jsonl")
+    
+    if not os.path.exists(feedback_file):
+        st.warning("No feedback data available yet. Use the chatbot to generate feedback.")
+        return pd.DataFrame()
+        
+    stat = os.stat(feedback_file)
+    return _parse_feedback_file(feedback_file, stat.st_mtime, stat.st_size)
+
+@st.cache_resource(show_spinner=False)
+def get_feedback_service():
+    """Create the feedback service once per process"""
+    return FeedbackService()
+
+@st.cache_data(show_spinner=False, max_entries=1)
+def _cached_analytics(mtime):
+    """Analytics from the feedback service; mtime of the analytics file is the cache key"""
+    return get_feedback_service().get_analytics()
+
+def load_analytics():
+    """Load analytics, re-reading the analytics file only when it changed"""
+    analytics_file = os.path.join(os.getcwd(), "feedback", "analytics.json")
+    mtime = os.stat(analytics_file).st_mtime if os.path.exists(analytics_file) else None
+    return _cached_analytics(mtime)
+
+@st.cache_resource(show_spinner=False)
+def get_kg_service():
+    """
+    Create the knowledge graph service once per process
+    
+    Returns:
+        tuple: (KnowledgeGraphService, lock held while a build runs)
+    """
+    # Imported here so the other tabs don't load spaCy and networkx
+    from src.services.knowledge_graph_service import KnowledgeGraphService
+    return KnowledgeGraphService(), threading.Lock()
+
+def build_knowledge_graph():
+    """Build the knowledge graph in this process, showing progress in an st.status box"""
+    kg_service, build_lock = get_kg_service()
+    if not build_lock.acquire(blocking=False):
+        st.warning("The knowledge graph is already being built.")
+        return
+        
+    try:
+        with st.status("Building knowledge graph...") as status:
+            st.write(f"Extracting entities and relations from {Config.DATA_DIR}")
+            if kg_service.build_graph_from_documents():
+                status.update(label="Knowledge graph built successfully!", state="complete")
+            else:
+                status.update(label="Failed to build knowledge graph", state="error")
+                return
+    finally:
+        build_lock.release()
+    st.rerun()
+
 def main():
     st.title("📊 Chatbot Analytics Dashboard")
     
-    # Initialize feedback service
-    feedback_service = FeedbackService()
-    analytics = feedback_service.get_analytics()
+    # Load analytics
+    analytics = load_analytics()
     
     # Load feedback data
     df = load_feedback_data()
@@ -73,6 +149,8 @@ def main():
     
     # Tab 1: Overview
     with tab1:
+        import altair as alt
+        
         st.header("Overview")
         
         # Key metrics in columns
@@ -95,8 +173,8 @@ def main():
                 
         with col4:
             if not df.empty and 'timestamp' in df.columns:
-                today = datetime.now().date()
-                queries_today = len(df[df['timestamp'].dt.date == today])
+                today = pd.Timestamp(datetime.now().date())
+                queries_today = int(((df['timestamp'] >= today) & (df['timestamp'] < today + pd.Timedelta(days=1))).sum())
                 st.metric("Queries Today", queries_today)
             else:
                 st.metric("Queries Today", 0)
@@ -129,9 +207,12 @@ def main():
         if not df.empty and 'timestamp' in df.columns:
             st.subheader("Queries Over Time")
             
-            # Group by day
-            df['date'] = df['timestamp'].dt.date
-            queries_by_day = df.groupby('date').size().reset_index(name='count')
+            # Count per day; days without queries count as 0
+            queries_by_day = (
+                df.resample('D', on='timestamp').size()
+                .rename_axis('date')
+                .reset_index(name='count')
+            )
             
             # Create line chart
             line_chart = alt.Chart(queries_by_day).mark_line().encode(
@@ -144,6 +225,8 @@ def main():
             
     # Tab 2: Query Analysis
     with tab2:
+        import altair as alt
+        
         st.header("Query Analysis")
         
         # Common query terms
@@ -169,22 +252,13 @@ def main():
         # Failed queries
         st.subheader("Recent Low-Rated Queries")
         
-        failed_queries = feedback_service.get_failed_queries(min_rating=2)
-        if failed_queries:
-            # Convert to dataframe
-            failed_df = pd.DataFrame([
-                {
-                    "Timestamp": q.get("timestamp", ""),
-                    "Query": q.get("query", ""),
-                    "Rating": q.get("rating", 0),
-                    "Comment": q.get("comment", "")
-                } for q in failed_queries
-            ])
+        # Select low-rated rows from the already loaded feedback instead of re-reading the file
+        failed_df = df.loc[df['rating'] <= FAILED_RATING, ['timestamp', 'query', 'rating', 'comment']]
+        if not failed_df.empty:
+            failed_df.columns = ['Timestamp', 'Query', 'Rating', 'Comment']
             
             # Sort by timestamp (recent first)
-            if 'Timestamp' in failed_df.columns:
-                failed_df['Timestamp'] = pd.to_datetime(failed_df['Timestamp'])
-                failed_df = failed_df.sort_values('Timestamp', ascending=False)
+            failed_df = failed_df.sort_values('Timestamp', ascending=False)
                 
             # Display as table
             st.dataframe(failed_df, use_container_width=True)
@@ -221,24 +295,23 @@ def main():
                     default=[]
                 )
             
-            # Apply filters
-            filtered_df = df.copy()
+            # Apply filters as one row mask; only the displayed columns get copied
+            mask = pd.Series(True, index=df.index)
             
-            if 'timestamp' in filtered_df.columns and len(date_range) == 2:
-                filtered_df = filtered_df[
-                    (filtered_df['timestamp'].dt.date >= date_range[0]) & 
-                    (filtered_df['timestamp'].dt.date <= date_range[1])
-                ]
+            if 'timestamp' in df.columns and len(date_range) == 2:
+                start = pd.Timestamp(date_range[0])
+                end = pd.Timestamp(date_range[1]) + pd.Timedelta(days=1)
+                mask &= (df['timestamp'] >= start) & (df['timestamp'] < end)
                 
             if rating_filter:
-                filtered_df = filtered_df[filtered_df['rating'].isin(rating_filter)]
+                mask &= df['rating'].isin(rating_filter)
             
             # Display feedback table
-            if not filtered_df.empty:
+            if mask.any():
                 # Prepare display columns
-                display_df = filtered_df[['timestamp', 'query', 'response', 'rating', 'comment']].copy()
+                display_df = df.loc[mask, ['timestamp', 'query', 'response', 'rating', 'comment']]
                 if 'timestamp' in display_df.columns:
-                    display_df['timestamp'] = display_df['timestamp'].dt.strftime('%Y-%m-%d %H:%M')
+                    display_df = display_df.assign(timestamp=display_df['timestamp'].dt.strftime('%Y-%m-%d %H:%M'))
                     
                 # Rename columns
                 display_df.columns = ['Timestamp', 'Query', 'Response', 'Rating', 'Comment']
@@ -255,7 +328,14 @@ def main():
         visualizations_dir = os.path.join(os.getcwd(), "visualizations")
         kg_viz_file = os.path.join(visualizations_dir, "knowledge_graph.png")
         
-        if os.path.exists(kg_viz_file):
+        # Builds don't re-render the image, so it's stale once the saved graph is newer
+        # (same check as graph_visualization_path, which would import spaCy here)
+        kg_viz_current = os.path.exists(kg_viz_file) and (
+            not os.path.exists(Config.KNOWLEDGE_GRAPH_FILE)
+            or os.path.getmtime(kg_viz_file) >= os.path.getmtime(Config.KNOWLEDGE_GRAPH_FILE)
+        )
+        
+        if kg_viz_current:
             st.subheader("Knowledge Graph Visualization")
             st.image(kg_viz_file, caption="Knowledge Graph Visualization")
             
@@ -267,6 +347,19 @@ def main():
             - Ensure facts are clearly stated in your documents
             - Run build_knowledge_graph.py after adding new content
             """)
+        elif os.path.exists(Config.KNOWLEDGE_GRAPH_FILE):
+            # Builds skip the slow layout and drawing; render only when asked
+            if os.path.exists(kg_viz_file):
+                st.info("The knowledge graph has changed since it was last rendered.")
+            else:
+                st.info("The knowledge graph is built but hasn't been rendered yet.")
+            if st.button("Render Knowledge Graph"):
+                kg_service, _ = get_kg_service()
+                with st.spinner("Rendering knowledge graph..."):
+                    rendered = kg_service.get_graph_visualization()
+                if rendered:
+                    st.rerun()
+                st.error("Failed to render the knowledge graph visualization")
         else:
             st.warning("Knowledge graph visualization not found. Run build_knowledge_graph.py to create it.")
             
@@ -280,13 +373,10 @@ def main():
             
         with col2:
             if st.button("Build Knowledge Graph"):
-                with st.spinner("Building knowledge graph..."):
-                    try:
-                        os.system("python src/build_knowledge_graph.py")
-                        st.success("Knowledge graph built successfully!")
-                        st.rerun()
-                    except Exception as e:
-                        st.error(f"Error building knowledge graph: {str(e)}")
+                try:
+                    build_knowledge_graph()
+                except Exception as e:
+                    st.error(f"Error building knowledge graph: {str(e)}")
 
 if __name__ == "__main__":
     main()
@@ -8,7 +8,7 @@ import sys
 import os
 
 from src.utils.config import Config
-from src.services.indexing_service import IndexingService
+from src.services.indexing_service import create_indexing_service
 from src.services.query_service import QueryService
 from src.services.hybrid_query_service import HybridQueryService
 
@@ -30,7 +30,7 @@ def main():
     print("Loading knowledge base...")
     
     # Load or create the vector index
-    indexing_service = IndexingService()
+    indexing_service = create_indexing_service()
     index = indexing_service.get_or_create_index()
     
     if not index:
@@ -44,11 +44,8 @@ def main():
         query_service = HybridQueryService(vector_index=index)
         
         # Check if knowledge graph has been built
-        visualizations_dir = os.path.join(os.getcwd(), "visualizations")
-        kg_viz_file = os.path.join(visualizations_dir, "knowledge_graph.png")
-        
-        if not os.path.exists(kg_viz_file):
-            print("Note: Knowledge graph visualization not found. You may want to run build_knowledge_graph.py first.")
+        if not os.path.exists(Config.KNOWLEDGE_GRAPH_FILE):
+            print("Note: Knowledge graph not found. You may want to run build_knowledge_graph.py first.")
     else:
         query_service = QueryService(index=index)
     
@@ -0,0 +1,149 @@
+import json
+import logging
+import math
+import os
+from typing import Optional
+
+import faiss
+import numpy as np
+from llama_index.core import (
+    VectorStoreIndex,
+    StorageContext,
+    load_index_from_storage,
+)
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.schema import MetadataMode
+from llama_index.vector_stores.faiss import FaissVectorStore
+
+from src.utils.config import Config
+from src.utils.data_loader import load_documents_from_directory
+from src.services.indexing_service import IndexingService
+
+logger = logging.getLogger(__name__)
+
+# Training points per inverted list below which FAISS warns and k-means centroids degrade
+MIN_TRAIN_POINTS_PER_LIST = 39
+
+# Records the embedding model the persisted index was built with
+EMBED_MODEL_FILE = "embed_model.json"
+
+class FAISSIndexingService(IndexingService):
+    """Indexing service that stores embeddings in a FAISS index instead of Chroma"""
+    
+    def _create_faiss_index(self, embeddings: np.ndarray) -> faiss.Index:
+        """
+        Create an empty FAISS index suited to the number of vectors
+        
+        Exact inner-product search is used up to Config.FAISS_FLAT_MAX_VECTORS;
+        larger corpora get an IVF-PQ index with about 4*sqrt(n) lists, so every
+        list has enough training points, trained on a sample of the embeddings.
+        Embeddings are normalized, so inner product equals cosine similarity.
+        
+        Args:
+            embeddings: Embeddings that will be added, one row per chunk
+        
+        Returns:
+            faiss.Index: The (trained) index
+        """
+        count, dim = embeddings.shape
+        if count <= Config.FAISS_FLAT_MAX_VECTORS:
+            logger.info(f"Using exact FAISS index for {count} vectors")
+            return faiss.IndexFlatIP(dim)
+        
+        nlist = max(1, min(int(4 * math.sqrt(count)), count // MIN_TRAIN_POINTS_PER_LIST))
+        factory = f"IVF{nlist},{Config.FAISS_PQ_ENCODING}"
+        logger.info(f"Training FAISS {factory} index for {count} vectors")
+        faiss_index = faiss.index_factory(dim, factory, faiss.METRIC_INNER_PRODUCT)
+        sample_size = min(count, Config.FAISS_TRAIN_POINTS_PER_LIST * nlist)
+        sample = embeddings[np.random.default_rng(0).choice(count, sample_size, replace=False)]
+        faiss_index.train(sample)
+        faiss.extract_index_ivf(faiss_index).nprobe = Config.FAISS_NPROBE
+        return faiss_index
+    
+    def build_index(self, documents_dir: str = Config.DATA_DIR) -> VectorStoreIndex:
+        """
+        Build a FAISS-backed vector index from documents in a directory
+        
+        Args:
+            documents_dir: Directory containing documents
+        
+        Returns:
+            VectorStoreIndex: The built index
+        """
+        # Load documents
+        documents = load_documents_from_directory(documents_dir)
+        
+        if not documents:
+            logger.error(f"No documents found in {documents_dir}")
+            return None
+        
+        # Create sentence splitter for text chunking
+        text_splitter = SentenceSplitter(
+            chunk_size=Config.CHUNK_SIZE,
+            chunk_overlap=Config.CHUNK_OVERLAP
+        )
+        nodes = text_splitter.get_nodes_from_documents(documents)
+        
+        # Embed up front: the IVF-PQ index has to be trained before anything is added
+        logger.info(f"Embedding {len(nodes)} chunks...")
+        texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes]
+        embeddings = self.embed_model.get_text_embedding_batch(texts, show_progress=True)
+        for node, embedding in zip(nodes, embeddings):
+            node.embedding = embedding
+        
+        faiss_index = self._create_faiss_index(np.asarray(embeddings, dtype=np.float32))
+        vector_store = FaissVectorStore(faiss_index=faiss_index)
+        storage_context = StorageContext.from_defaults(vector_store=vector_store)
+        
+        # Build index; nodes already carry their embeddings, so nothing is embedded twice
+        logger.info("Building index...")
+        self.index = VectorStoreIndex(
+            nodes,
+            storage_context=storage_context,
+            embed_model=self.embed_model,
+            insert_batch_size=Config.INSERT_BATCH_SIZE,
+        )
+        storage_context.persist(persist_dir=Config.FAISS_INDEX_DIRECTORY)
+        with open(os.path.join(Config.FAISS_INDEX_DIRECTORY, EMBED_MODEL_FILE), "w") as f:
+            json.dump({"embed_model": Config.EMBED_MODEL}, f)
+        
+        logger.info("Index built successfully")
+        return self.index
+    
+    def load_index(self) -> Optional[VectorStoreIndex]:
+        """
+        Load an existing FAISS index from storage
+        
+        Returns:
+            VectorStoreIndex or None if not found
+        """
+        if not os.path.exists(Config.FAISS_INDEX_DIRECTORY):
+            logger.warning(f"No index found at {Config.FAISS_INDEX_DIRECTORY}")
+            return None
+        
+        try:
+            built_with = None
+            embed_model_path = os.path.join(Config.FAISS_INDEX_DIRECTORY, EMBED_MODEL_FILE)
+            if os.path.exists(embed_model_path):
+                with open(embed_model_path) as f:
+                    built_with = json.load(f).get("embed_model")
+            if not self._embed_model_matches(built_with):
+                return None
+                
+            vector_store = FaissVectorStore.from_persist_dir(Config.FAISS_INDEX_DIRECTORY)
+            try:
+                faiss.extract_index_ivf(vector_store.client).nprobe = Config.FAISS_NPROBE
+            except RuntimeError:
+                # Exact (flat) index; nothing to tune
+                pass
+            
+            storage_context = StorageContext.from_defaults(
+                vector_store=vector_store,
+                persist_dir=Config.FAISS_INDEX_DIRECTORY,
+            )
+            self.index = load_index_from_storage(storage_context, embed_model=self.embed_model)
+            logger.info("Index loaded successfully")
+            return self.index
+        except Exception as e:
+            logger.error(f"Failed to load index: {str(e)}")
+            return None
@@ -1,13 +1,32 @@
+import atexit
 import logging
 import os
-import json
+import threading
+import time
+from collections import Counter
 from datetime import datetime
 from typing import Dict, List, Any, Optional
 
+import orjson
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
 from src.utils.config import Config
 
 logger = logging.getLogger(__name__)
 
+# Ratings at or below this are failed queries, also kept in a separate file
+FAILED_RATING = 2
+
+# Most frequent query terms kept in analytics; rarer terms are dropped so the file stays small
+MAX_QUERY_TERMS = 1000
+
+# Minimum seconds between analytics file writes; updates in between are written together
+ANALYTICS_FLUSH_INTERVAL_S = 5
+
 class FeedbackService:
     """Service for collecting and analyzing user feedback"""
     
@@ -20,6 +39,56 @@ class FeedbackService:
             
         self.feedback_file = os.path.join(self.feedback_dir, "feedback.jsonl")
         self.analytics_file = os.path.join(self.feedback_dir, "analytics.json")
+        self.failed_file = os.path.join(self.feedback_dir, "failed.jsonl")
+        
+        # Backfill the failed queries file from feedback saved before it existed
+        if os.path.exists(self.feedback_file) and not os.path.exists(self.failed_file):
+            failed_queries = self._read_entries(self.feedback_file, FAILED_RATING)
+            with open(self.failed_file, "wb") as f:
+                f.writelines(orjson.dumps(entry) + b"\n" for entry in failed_queries)
+                
+        # Analytics are kept in memory and written to disk at most every ANALYTICS_FLUSH_INTERVAL_S
+        self._analytics = None
+        self._analytics_lock = threading.Lock()
+        self._last_flush = 0.0
+        self._flush_timer = None
+        
+        # Append handles, opened on the first save and kept open
+        self._feedback_fh = None
+        self._failed_fh = None
+        self._write_lock = threading.Lock()
+        
+    def _append_line(self, fh, line: bytes) -> None:
+        """
+        Append a line to an open feedback file and flush it
+        
+        The file is locked for the write, so other processes appending to
+        the same file (e.g. several app instances) don't interleave lines.
+        """
+        if fcntl is not None:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            fh.write(line)
+            fh.flush()
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+                
+    def _open_files(self) -> None:
+        """Open the feedback files for appending, once per service"""
+        if self._feedback_fh is None:
+            self._feedback_fh = open(self.feedback_file, "ab")
+            self._failed_fh = open(self.failed_file, "ab")
+            atexit.register(self.close)
+            
+    def close(self) -> None:
+        """Close the feedback files and write any pending analytics"""
+        with self._write_lock:
+            for fh in (self._feedback_fh, self._failed_fh):
+                if fh is not None:
+                    fh.close()
+            self._feedback_fh = self._failed_fh = None
+        self._flush_analytics(force=True)
         
     def save_feedback(self, query: str, response: Dict[str, Any], rating: int, 
                      comment: Optional[str] = None) -> bool:
@@ -52,8 +121,14 @@ class FeedbackService:
             }
             
             # Append to feedback file
-            with open(self.feedback_file, "a") as f:
-                f.write(json.dumps(entry) + "\n")
+            line = orjson.dumps(entry) + b"\n"
+            with self._write_lock:
+                self._open_files()
+                self._append_line(self._feedback_fh, line)
+                
+                # Failed queries also go to their own file, so listing them doesn't scan all feedback
+                if rating <= FAILED_RATING:
+                    self._append_line(self._failed_fh, line)
                 
             # Update analytics
             self._update_analytics(entry)
@@ -72,36 +147,79 @@ class FeedbackService:
             entry: Feedback entry
         """
         try:
-            # Load existing analytics or create new
-            analytics = self._load_analytics()
-            
-            # Update total queries and average rating
-            analytics["total_queries"] += 1
-            analytics["total_rating_sum"] += entry["rating"]
-            analytics["average_rating"] = analytics["total_rating_sum"] / analytics["total_queries"]
-            
-            # Update rating distribution
-            rating_str = str(entry["rating"])
-            if rating_str in analytics["rating_distribution"]:
-                analytics["rating_distribution"][rating_str] += 1
-            else:
-                analytics["rating_distribution"][rating_str] = 1
+            with self._analytics_lock:
+                # Load existing analytics once, then update them in memory
+                if self._analytics is None:
+                    self._analytics = self._load_analytics()
+                    atexit.register(self._flush_analytics, force=True)
+                analytics = self._analytics
+                self._apply_entry(analytics, entry)
                 
-            # Track common queries
-            query_words = entry["query"].lower().split()
-            for word in query_words:
-                if len(word) > 3:  # Skip short words
-                    if word in analytics["common_query_terms"]:
-                        analytics["common_query_terms"][word] += 1
-                    else:
-                        analytics["common_query_terms"][word] = 1
-                        
-            # Save updated analytics
-            with open(self.analytics_file, "w") as f:
-                json.dump(analytics, f, indent=2)
+            self._flush_analytics()
                 
         except Exception as e:
             logger.error(f"Error updating analytics: {str(e)}")
+            
+    def _apply_entry(self, analytics: Dict[str, Any], entry: Dict[str, Any]) -> None:
+        """
+        Add a feedback entry to the analytics
+        
+        Args:
+            analytics: Analytics data, updated in place
+            entry: Feedback entry
+        """
+        # Update total queries and average rating
+        analytics["total_queries"] += 1
+        analytics["total_rating_sum"] += entry["rating"]
+        analytics["average_rating"] = analytics["total_rating_sum"] / analytics["total_queries"]
+        
+        # Update rating distribution
+        rating_str = str(entry["rating"])
+        if rating_str in analytics["rating_distribution"]:
+            analytics["rating_distribution"][rating_str] += 1
+        else:
+            analytics["rating_distribution"][rating_str] = 1
+            
+        # Track common queries, skipping short words
+        query_terms = Counter(analytics["common_query_terms"])
+        query_terms.update(word for word in entry["query"].lower().split() if len(word) > 3)
+        analytics["common_query_terms"] = dict(query_terms.most_common(MAX_QUERY_TERMS))
+        analytics["last_updated"] = datetime.now().isoformat()
+        
+    def _flush_analytics(self, force: bool = False) -> None:
+        """
+        Write the in-memory analytics to disk, at most every ANALYTICS_FLUSH_INTERVAL_S
+        
+        An update that arrives sooner is written by a timer once the interval
+        has passed, so bursts of feedback cost one write.
+        
+        Args:
+            force: Write now regardless of when the last write happened
+        """
+        with self._analytics_lock:
+            if self._analytics is None:
+                return
+                
+            wait = self._last_flush + ANALYTICS_FLUSH_INTERVAL_S - time.monotonic()
+            if not force and wait > 0:
+                if self._flush_timer is None:
+                    self._flush_timer = threading.Timer(wait, self._flush_analytics, kwargs={"force": True})
+                    self._flush_timer.daemon = True
+                    self._flush_timer.start()
+                return
+                
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+                
+            try:
+                tmp_path = f"{self.analytics_file}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(orjson.dumps(self._analytics))
+                os.replace(tmp_path, self.analytics_file)
+                self._last_flush = time.monotonic()
+            except Exception as e:
+                logger.error(f"Error saving analytics: {str(e)}")
     
     def _load_analytics(self) -> Dict[str, Any]:
         """
@@ -122,8 +240,8 @@ class FeedbackService:
             }
         
         try:
-            with open(self.analytics_file, "r") as f:
-                analytics = json.load(f)
+            with open(self.analytics_file, "rb") as f:
+                analytics = orjson.loads(f.read())
                 # Update last updated timestamp
                 analytics["last_updated"] = datetime.now().isoformat()
                 return analytics
@@ -145,6 +263,9 @@ class FeedbackService:
         Returns:
             Dict containing analytics data
         """
+        with self._analytics_lock:
+            if self._analytics is not None:
+                return dict(self._analytics)
         return self._load_analytics()
         
     def get_failed_queries(self, min_rating: int = 2) -> List[Dict[str, Any]]:
@@ -157,22 +278,38 @@ class FeedbackService:
         Returns:
             List of failed query entries
         """
-        failed_queries = []
+        # The failed queries file holds exactly the entries rated FAILED_RATING or lower
+        if min_rating <= FAILED_RATING and os.path.exists(self.failed_file):
+            return self._read_entries(self.failed_file, min_rating)
+        return self._read_entries(self.feedback_file, min_rating)
+        
+    def _read_entries(self, path: str, max_rating: int) -> List[Dict[str, Any]]:
+        """
+        Read feedback entries rated max_rating or lower from a JSONL file
+        
+        Args:
+            path: Feedback JSONL file
+            max_rating: Highest rating to include
+            
+        Returns:
+            List of matching entries
+        """
+        entries = []
         
-        if not os.path.exists(self.feedback_file):
-            return failed_queries
+        if not os.path.exists(path):
+            return entries
             
         try:
-            with open(self.feedback_file, "r") as f:
+            with open(path, "rb") as f:
                 for line in f:
                     try:
-                        entry = json.loads(line.strip())
-                        if entry.get("rating", 0) <= min_rating:
-                            failed_queries.append(entry)
-                    except json.JSONDecodeError:
+                        entry = orjson.loads(line)
+                        if entry.get("rating", 0) <= max_rating:
+                            entries.append(entry)
+                    except orjson.JSONDecodeError:
                         continue
                         
-            return failed_queries
+            return entries
         except Exception as e:
             logger.error(f"Error getting failed queries: {str(e)}")
             return []
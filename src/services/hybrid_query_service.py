@@ -1,5 +1,9 @@
 import logging
-from typing import Dict, List, Any, Optional
+import string
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Iterator, Optional
 import re
 
 from llama_index.core import VectorStoreIndex
@@ -7,7 +11,7 @@ from llama_index.core.response_synthesizers import get_response_synthesizer
 from llama_index.llms.openai import OpenAI
 
 from src.utils.config import Config
-from src.services.query_service import QueryService
+from src.services.query_service import QueryService, RetryCallback, call_with_timeout
 from src.services.knowledge_graph_service import KnowledgeGraphService
 
 logger = logging.getLogger(__name__)
@@ -15,20 +19,76 @@ logger = logging.getLogger(__name__)
 class HybridQueryService:
     """Service that combines semantic search and knowledge graph queries"""
     
-    def __init__(self, vector_index: Optional[VectorStoreIndex] = None):
+    # Question words that suggest a factual query, as one case-insensitive pattern
+    _FACTUAL_RE = re.compile(
+        r'\b(?:what|who|when|where)\s+is\b|\bhow\s+many\b|\bwhich\b|\bcan\s+i\b|\bdo\s+you\b',
+        re.IGNORECASE
+    )
+    
+    # Words one of a factual question's first two words must be (punctuation stripped) before
+    # the regex runs: question words, and requests that lead into one ("Tell me who is...")
+    _FACTUAL_GATE_WORDS = frozenset({
+        "what", "who", "when", "where", "how", "which", "can", "do",
+        "tell", "show", "list", "name",
+    })
+    
+    def __init__(self, vector_index: Optional[VectorStoreIndex] = None,
+                 kg_service: Optional[KnowledgeGraphService] = None):
         """
         Initialize the hybrid query service
         
         Args:
             vector_index: VectorStoreIndex to query against
+            kg_service: Shared KnowledgeGraphService, or None to create one
         """
         self.vector_query_service = QueryService(index=vector_index)
-        self.kg_service = KnowledgeGraphService()
-        self.llm = OpenAI(model=Config.DEFAULT_LLM_MODEL, api_key=Config.OPENAI_API_KEY)
+        self.kg_service = kg_service or KnowledgeGraphService()
+        self.llm = OpenAI(model=Config.DEFAULT_LLM_MODEL, api_key=Config.OPENAI_API_KEY, timeout=Config.QUERY_TIMEOUT_S)
+        
+        # Runs the knowledge graph lookup and vector search side by side
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="hybrid")
+        
+        # Responses to recent queries, keyed by normalized query text, least recently used first
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
         
     def set_index(self, index: VectorStoreIndex):
         """Set the vector index to query against"""
         self.vector_query_service.set_index(index)
+        self.clear_cache()
+        
+    def clear_cache(self):
+        """Forget cached responses, e.g. after the index or knowledge graph was rebuilt"""
+        with self._cache_lock:
+            self._cache.clear()
+            
+    def _cache_key(self, query_text: str) -> str:
+        """Normalize a query so differences in case and whitespace share a cache entry"""
+        return " ".join(query_text.lower().split())
+        
+    def _cache_get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a copy of the cached response for a key, or None"""
+        with self._cache_lock:
+            response = self._cache.get(key)
+            if response is None:
+                return None
+            self._cache.move_to_end(key)
+        logger.info("Serving query from cache")
+        return self._copy_response(response)
+        
+    def _cache_put(self, key: str, response: Dict[str, Any]):
+        """Cache a successful response, evicting the least recently used beyond Config.QUERY_CACHE_SIZE"""
+        if response.get("error"):
+            return
+        with self._cache_lock:
+            self._cache[key] = self._copy_response(response)
+            self._cache.move_to_end(key)
+            if len(self._cache) > Config.QUERY_CACHE_SIZE:
+                self._cache.popitem(last=False)
+                
+    def _copy_response(self, response: Dict[str, Any]) -> Dict[str, Any]:
+        """Copy a response and its sources, so callers can modify them without touching the cache"""
+        return {"answer": response["answer"], "sources": [dict(source) for source in response["sources"]]}
         
     def _is_factual_question(self, query: str) -> bool:
         """
@@ -40,53 +100,163 @@ class HybridQueryService:
         Returns:
             bool: True if likely factual, False otherwise
         """
-        # Check for question words
-        factual_indicators = [
-            r'\bwhat\s+is\b', r'\bwho\s+is\b', r'\bwhen\s+is\b', r'\bwhere\s+is\b',
-            r'\bhow\s+many\b', r'\bwhich\b', r'\bcan\s+i\b', r'\bdo\s+you\b'
-        ]
+        # Most chat messages don't open with a question; skip the regex for them
+        first_words = query.split(None, 2)[:2]
+        if not any(word.strip(string.punctuation).lower() in self._FACTUAL_GATE_WORDS for word in first_words):
+            return False
+        return bool(self._FACTUAL_RE.search(query))
         
-        # Check for specific formats that suggest factual queries
-        for pattern in factual_indicators:
-            if re.search(pattern, query.lower()):
-                return True
-                
-        return False
+    def _query_both(self, query_text: str, on_retry: Optional[RetryCallback] = None):
+        """
+        Query the knowledge graph and the vector index concurrently
+        
+        The vector search runs on the calling thread, so on_retry is called there too.
+        
+        Args:
+            query_text: The query text
+            on_retry: Called before a timed out vector search is retried
+            
+        Returns:
+            tuple: (knowledge graph response, vector search response)
+        """
+        kg_future = self._executor.submit(self.kg_service.query_graph, query_text)
+        vector_response = self.vector_query_service.query(query_text, on_retry=on_retry)
+        return kg_future.result(), vector_response
+        
+    def query(self, query_text: str, on_retry: Optional[RetryCallback] = None) -> Dict[str, Any]:
+        """
+        Query both the vector index and knowledge graph, reusing cached responses to repeated queries
+        
+        Args:
+            query_text: The query text
+            on_retry: Called before a timed out LLM call is retried
+            
+        Returns:
+            Dict containing response and source information
+        """
+        key = self._cache_key(query_text)
+        response = self._cache_get(key)
+        if response is None:
+            response = self._query(query_text, on_retry)
+            self._cache_put(key, response)
+        return response
         
-    def query(self, query_text: str) -> Dict[str, Any]:
+    def _query(self, query_text: str, on_retry: Optional[RetryCallback] = None) -> Dict[str, Any]:
         """
         Query both the vector index and knowledge graph
         
         Args:
             query_text: The query text
+            on_retry: Called before a timed out LLM call is retried
             
         Returns:
             Dict containing response and source information
         """
         is_factual = self._is_factual_question(query_text)
         
-        # For factual questions, try knowledge graph first
+        # For factual questions, search the knowledge graph and the vector index together
         if is_factual:
-            logger.info(f"Query appears factual, trying knowledge graph first: {query_text}")
-            kg_response = self.kg_service.query_graph(query_text)
+            logger.info(f"Query appears factual, also searching knowledge graph: {query_text}")
+            kg_response, vector_response = self._query_both(query_text, on_retry)
             
             # If knowledge graph found facts, use them
             if kg_response["facts"]:
                 logger.info("Found facts in knowledge graph")
                 
-                # Also get vector search results for context
-                vector_response = self.vector_query_service.query(query_text)
-                
                 # Combine results
-                combined_response = self._combine_results(query_text, kg_response, vector_response)
+                combined_response = self._combine_results(query_text, kg_response, vector_response, on_retry)
                 return combined_response
+                
+            # No facts; the vector search answer is already done
+            return vector_response
         
         # For non-factual questions or when no facts found, fallback to vector search
         logger.info(f"Using vector search for query: {query_text}")
-        return self.vector_query_service.query(query_text)
+        return self.vector_query_service.query(query_text, on_retry=on_retry)
+        
+    def query_stream(self, query_text: str, result: Dict[str, Any],
+                     on_retry: Optional[RetryCallback] = None) -> Iterator[str]:
+        """
+        Query both the vector index and knowledge graph, yielding the answer as it's generated
+        
+        Args:
+            query_text: The query text
+            result: Dict filled with "sources" before the first token and with
+                the full "answer" once the stream is exhausted
+            on_retry: Called before a timed out LLM call is retried
+            
+        Yields:
+            str: Answer tokens
+        """
+        key = self._cache_key(query_text)
+        cached = self._cache_get(key)
+        if cached is not None:
+            result.update(cached)
+            yield result["answer"]
+            return
+            
+        yield from self._query_stream(query_text, result, on_retry)
+        self._cache_put(key, result)
+        
+    def _query_stream(self, query_text: str, result: Dict[str, Any],
+                      on_retry: Optional[RetryCallback] = None) -> Iterator[str]:
+        """
+        Query both the vector index and knowledge graph, yielding the answer as it's generated
+        
+        Args:
+            query_text: The query text
+            result: Dict filled with "sources" and "answer", as for query_stream
+            on_retry: Called before a timed out LLM call is retried
+            
+        Yields:
+            str: Answer tokens
+        """
+        if self._is_factual_question(query_text):
+            logger.info(f"Query appears factual, also searching knowledge graph: {query_text}")
+            kg_response, vector_response = self._query_both(query_text, on_retry)
+            
+            if not kg_response["facts"]:
+                # No facts; the vector search answer is already done
+                result.update(vector_response)
+                yield result["answer"]
+                return
+                
+            logger.info("Found facts in knowledge graph")
+            facts = kg_response["facts"]
+            direct_answer = self._direct_answer(facts, vector_response)
+            result["sources"] = self._combined_sources(facts, vector_response)
+            # An answer built without the vector side is incomplete; don't cache it
+            result["error"] = vector_response.get("error", False)
+            
+            if direct_answer:
+                result["answer"] = direct_answer
+                yield direct_answer
+                return
+                
+            tokens = []
+            try:
+                for chunk in self.llm.stream_complete(self._combined_prompt(query_text, facts, vector_response)):
+                    tokens.append(chunk.delta)
+                    yield chunk.delta
+            except Exception as e:
+                logger.error(f"Error generating combined response: {str(e)}")
+                if tokens:
+                    # The answer is cut short; don't cache it
+                    result["error"] = True
+                else:
+                    fallback = vector_response.get("answer", "Sorry, I couldn't generate a combined answer.")
+                    tokens.append(fallback)
+                    yield fallback
+                    
+            result["answer"] = "".join(tokens)
+            return
+                
+        logger.info(f"Using vector search for query: {query_text}")
+        yield from self.vector_query_service.query_stream(query_text, result, on_retry=on_retry)
     
     def _combine_results(self, query: str, kg_response: Dict[str, Any], 
-                         vector_response: Dict[str, Any]) -> Dict[str, Any]:
+                         vector_response: Dict[str, Any],
+                         on_retry: Optional[RetryCallback] = None) -> Dict[str, Any]:
         """
         Combine results from knowledge graph and vector search
         
@@ -94,6 +264,7 @@ class HybridQueryService:
             query: Original query
             kg_response: Response from knowledge graph
             vector_response: Response from vector search
+            on_retry: Called before a timed out LLM call is retried
             
         Returns:
             Dict containing combined response
@@ -101,23 +272,79 @@ class HybridQueryService:
         # Extract facts from knowledge graph
         facts = kg_response.get("facts", [])
         
+        combined_answer = self._direct_answer(facts, vector_response)
+        if not combined_answer:
+            prompt = self._combined_prompt(query, facts, vector_response)
+            
+            # Generate combined response using LLM
+            try:
+                combined_answer = call_with_timeout(lambda: self.llm.complete(prompt), on_retry).text
+            except Exception as e:
+                logger.error(f"Error generating combined response: {str(e)}")
+                combined_answer = vector_response.get("answer", "Sorry, I couldn't generate a combined answer.")
+                
+        return {
+            "answer": combined_answer,
+            "sources": self._combined_sources(facts, vector_response),
+            # An answer built without the vector side is incomplete; don't cache it
+            "error": vector_response.get("error", False)
+        }
+        
+    def _direct_answer(self, facts: List[Dict[str, Any]],
+                       vector_response: Dict[str, Any]) -> Optional[str]:
+        """
+        Answer without the LLM when the knowledge graph found a single unambiguous fact
+        
+        Args:
+            facts: Facts found in the knowledge graph
+            vector_response: Response from vector search
+            
+        Returns:
+            str: The vector search answer if it had relevant context, otherwise the fact
+            as a sentence; None if the LLM should combine the results
+        """
+        if len(facts) != 1:
+            return None
+            
+        has_context = any(
+            source.get("text") and (source.get("score") or 0) >= Config.DIRECT_ANSWER_MIN_SCORE
+            for source in vector_response.get("sources", [])
+        )
+        if has_context and not vector_response.get("error"):
+            # The vector search answer is already paid for and reads better than the bare fact
+            logger.info("Answering a single knowledge graph fact with the vector search answer")
+            return vector_response["answer"]
+            
+        fact = facts[0]
+        logger.info("Answering from a single knowledge graph fact without the LLM")
+        return f"{fact['subject']} {fact['predicate']} {fact['object']}."
+        
+    def _combined_prompt(self, query: str, facts: List[Dict[str, Any]],
+                         vector_response: Dict[str, Any]) -> str:
+        """
+        Build the prompt that asks the LLM to answer from graph facts and vector search context
+        
+        Args:
+            query: Original query
+            facts: Facts found in the knowledge graph
+            vector_response: Response from vector search
+            
+        Returns:
+            str: The prompt
+        """
         # Extract context from vector search
-        contexts = []
-        for source in vector_response.get("sources", []):
-            context = source.get("text", "")
-            if context:
-                contexts.append(context)
+        contexts = [source["text"] for source in vector_response.get("sources", []) if source.get("text")]
                 
         # Create a prompt to combine the information
-        facts_text = "\n".join([
+        facts_text = "\n".join(
             f"- {fact['subject']} {fact['predicate']} {fact['object']}" 
             for fact in facts[:5]  # Limit to top 5 facts
-        ])
+        )
         
-        context_text = "\n".join([
+        context_text = "\n".join(
             f"- {context[:200]}..." if len(context) > 200 else f"- {context}"
             for context in contexts[:3]  # Limit to top 3 contexts
-        ])
+        )
         
         prompt = f"""
         Question: {query}
@@ -130,20 +357,26 @@ class HybridQueryService:
         
         Based on the above knowledge graph facts and additional context, please provide a comprehensive answer to the question.
         """
+        return prompt
+        
+    def _combined_sources(self, facts: List[Dict[str, Any]],
+                          vector_response: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Combine the vector search sources with the knowledge graph facts
         
-        # Generate combined response using LLM
-        try:
-            combined_answer = self.llm.complete(prompt).text
-        except Exception as e:
-            logger.error(f"Error generating combined response: {str(e)}")
-            combined_answer = vector_response.get("answer", "Sorry, I couldn't generate a combined answer.")
+        Args:
+            facts: Facts found in the knowledge graph
+            vector_response: Response from vector search
             
+        Returns:
+            List of source dicts
+        """
         # Combine sources
-        sources = vector_response.get("sources", [])
+        sources = list(vector_response.get("sources", []))
         
         # Add knowledge graph as a source
-        for fact in facts:
-            source = {
+        sources.extend(
+            {
                 "text": fact.get("sentence", ""),
                 "metadata": {
                     "source": fact.get("source", "knowledge_graph"),
@@ -154,9 +387,7 @@ class HybridQueryService:
                 },
                 "score": None
             }
-            sources.append(source)
+            for fact in facts
+        )
             
-        return {
-            "answer": combined_answer,
-            "sources": sources
-        }
+        return sources
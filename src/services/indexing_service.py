@@ -1,3 +1,5 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from typing import List, Optional
 import os
 import logging
@@ -6,11 +8,10 @@ from llama_index.core import (
     VectorStoreIndex,
     SimpleDirectoryReader,
     StorageContext,
-    load_index_from_storage,
-    ServiceContext,
 )
 from llama_index.core.node_parser import SentenceSplitter
-from llama_index.embeddings.openai import OpenAIEmbedding
+from llama_index.core.schema import BaseNode, MetadataMode
+from llama_index.embeddings.huggingface import HuggingFaceEmbedding
 from llama_index.vector_stores.chroma import ChromaVectorStore
 import chromadb
 
@@ -19,11 +20,117 @@ from src.utils.data_loader import load_documents_from_directory
 
 logger = logging.getLogger(__name__)
 
+@lru_cache(maxsize=None)
+def get_embed_model() -> HuggingFaceEmbedding:
+    """
+    Load the sentence-transformers embedding model once per process
+    
+    The model runs locally (on the GPU when available) and embeds chunks in
+    batches of Config.EMBED_BATCH_SIZE.
+    
+    Returns:
+        HuggingFaceEmbedding: The shared embedding model
+    """
+    return HuggingFaceEmbedding(
+        model_name=Config.EMBED_MODEL,
+        embed_batch_size=Config.EMBED_BATCH_SIZE,
+        normalize=True,
+    )
+
+def create_indexing_service() -> "IndexingService":
+    """
+    Create the indexing service for the configured vector store backend
+    
+    Returns:
+        IndexingService: FAISSIndexingService when Config.VECTOR_BACKEND is "faiss",
+        otherwise the Chroma-backed IndexingService
+    """
+    if Config.VECTOR_BACKEND == "faiss":
+        from src.services.faiss_indexing_service import FAISSIndexingService
+        return FAISSIndexingService()
+    return IndexingService()
+
 class IndexingService:
     def __init__(self):
-        self.embed_model = OpenAIEmbedding()
+        self.embed_model = get_embed_model()
         self.index = None
         
+        # Chroma client, collection and vector store, opened on first use and reused
+        self._chroma_client = None
+        self._chroma_collection = None
+        self._vector_store = None
+        
+    def _embed_model_matches(self, built_with: Optional[str]) -> bool:
+        """
+        Check that a stored index was embedded with the configured model
+        
+        Query embeddings from a different model (or dimension) can't be compared
+        with the stored ones, so such an index has to be rebuilt.
+        
+        Args:
+            built_with: Embedding model recorded when the index was built, None if unrecorded
+            
+        Returns:
+            bool: True if the index can be used with Config.EMBED_MODEL
+        """
+        if built_with == Config.EMBED_MODEL:
+            return True
+        logger.error(
+            f"The stored index was built with embedding model {built_with or 'unknown (an older version)'}, "
+            f"but EMBED_MODEL is {Config.EMBED_MODEL}. It must be rebuilt: run python src/build_index.py"
+        )
+        return False
+        
+    def _get_vector_store(self, reset: bool = False) -> ChromaVectorStore:
+        """
+        Get the Chroma vector store, opening the client and collection once per service
+        
+        Args:
+            reset: Empty the collection first, so rebuilding doesn't duplicate chunks
+            
+        Returns:
+            ChromaVectorStore: Vector store over the "documents" collection
+        """
+        if self._chroma_client is None:
+            self._chroma_client = chromadb.PersistentClient(path=Config.CHROMA_DB_DIRECTORY)
+            
+        if self._chroma_collection is None:
+            self._chroma_collection = self._chroma_client.get_or_create_collection("documents")
+            
+        if reset:
+            self._reset_collection()
+            
+        if self._vector_store is None:
+            self._vector_store = ChromaVectorStore(chroma_collection=self._chroma_collection)
+        return self._vector_store
+        
+    def _reset_collection(self):
+        """
+        Empty the "documents" collection before a rebuild
+        
+        The collection is cleared in place, because other sessions and processes
+        (the app, the updater) keep querying through their own handles to it and
+        those stop working if it's dropped. A collection built with another (or an
+        unrecorded) embedding model is dropped and recreated instead: Chroma fixes
+        the embedding dimension per collection, and no index over it could be
+        loaded with the configured model anyway.
+        """
+        collection = self._chroma_collection
+        if (collection.metadata or {}).get("embed_model") == Config.EMBED_MODEL:
+            ids = collection.get(include=[])["ids"]
+            batch_size = self._chroma_client.get_max_batch_size()
+            for start in range(0, len(ids), batch_size):
+                collection.delete(ids=ids[start:start + batch_size])
+            return
+            
+        self._chroma_client.delete_collection("documents")
+        # The new collection records the embedding model it's built with
+        self._chroma_collection = self._chroma_client.create_collection(
+            "documents",
+            metadata={"embed_model": Config.EMBED_MODEL},
+        )
+        self._vector_store = None
+        
     def build_index(self, documents_dir: str = Config.DATA_DIR) -> VectorStoreIndex:
         """
         Build a vector index from documents in a directory
@@ -46,30 +153,50 @@ class IndexingService:
             chunk_size=Config.CHUNK_SIZE,
             chunk_overlap=Config.CHUNK_OVERLAP
         )
+        nodes = text_splitter.get_nodes_from_documents(documents)
         
-        # Set up Chroma client
-        chroma_client = chromadb.PersistentClient(path=Config.CHROMA_DB_DIRECTORY)
-        chroma_collection = chroma_client.get_or_create_collection("documents")
-        vector_store = ChromaVectorStore(chroma_collection=chroma_collection)
-        storage_context = StorageContext.from_defaults(vector_store=vector_store)
+        # Start from an empty collection so rebuilding doesn't duplicate chunks
+        storage_context = StorageContext.from_defaults(vector_store=self._get_vector_store(reset=True))
         
-        # Create service context
-        service_context = ServiceContext.from_defaults(
-            embed_model=self.embed_model,
-            node_parser=text_splitter
-        )
-        
-        # Build index
-        logger.info("Building index...")
-        self.index = VectorStoreIndex.from_documents(
-            documents,
+        # Build index, embedding and adding chunks to Chroma in large batches
+        logger.info(f"Building index from {len(nodes)} chunks...")
+        self.index = VectorStoreIndex(
+            [],
             storage_context=storage_context,
-            service_context=service_context
+            embed_model=self.embed_model,
+            insert_batch_size=Config.INSERT_BATCH_SIZE,
         )
+        self._embed_and_insert(nodes)
         
         logger.info("Index built successfully")
         return self.index
         
+    def _embed_and_insert(self, nodes: List[BaseNode]):
+        """
+        Embed nodes and insert them into the index, one Config.INSERT_BATCH_SIZE batch at a time
+        
+        Each batch is written to the vector store on a background thread while
+        the next one is embedded, so the model isn't idle during the writes.
+        
+        Args:
+            nodes: Nodes to add
+        """
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="index-writer") as writer:
+            pending = None
+            for start in range(0, len(nodes), Config.INSERT_BATCH_SIZE):
+                batch = nodes[start:start + Config.INSERT_BATCH_SIZE]
+                texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in batch]
+                for node, embedding in zip(batch, self.embed_model.get_text_embedding_batch(texts)):
+                    node.embedding = embedding
+                    
+                # Nodes that already carry an embedding aren't embedded again on insert
+                if pending is not None:
+                    pending.result()
+                pending = writer.submit(self.index.insert_nodes, batch)
+                
+            if pending is not None:
+                pending.result()
+        
     def load_index(self) -> Optional[VectorStoreIndex]:
         """
         Load an existing index from storage
@@ -82,14 +209,15 @@ class IndexingService:
             return None
             
         try:
-            # Set up Chroma client
-            chroma_client = chromadb.PersistentClient(path=Config.CHROMA_DB_DIRECTORY)
-            chroma_collection = chroma_client.get_or_create_collection("documents")
-            vector_store = ChromaVectorStore(chroma_collection=chroma_collection)
-            storage_context = StorageContext.from_defaults(vector_store=vector_store)
+            vector_store = self._get_vector_store()
+            if not self._embed_model_matches((self._chroma_collection.metadata or {}).get("embed_model")):
+                return None
             
-            # Load index
-            self.index = load_index_from_storage(storage_context)
+            # Attach to the stored embeddings; queries are embedded with the same model
+            self.index = VectorStoreIndex.from_vector_store(
+                vector_store,
+                embed_model=self.embed_model,
+            )
             logger.info("Index loaded successfully")
             return self.index
         except Exception as e:
@@ -98,7 +226,8 @@ class IndexingService:
             
     def get_or_create_index(self) -> VectorStoreIndex:
         """
-        Get an existing index or create a new one if it doesn't exist
+        Get an existing index or create a new one if it doesn't exist (or was
+        built with a different embedding model)
         
         Returns:
             VectorStoreIndex: The loaded or created index
@@ -1,5 +1,13 @@
+import functools
+import hashlib
+import html
+import itertools
+import json
 import logging
 import os
+import pickle
+import sys
+import threading
 from typing import List, Dict, Any, Tuple, Optional
 import spacy
 from py2neo import Graph, Node, Relationship
@@ -8,31 +16,194 @@ import matplotlib.pyplot as plt
 import re
 
 from src.utils.config import Config
-from src.utils.data_loader import load_documents_from_directory
+from src.utils.data_loader import iter_documents_from_directory, load_documents_from_files
 
 logger = logging.getLogger(__name__)
 
+# Edge endpoint keys in the saved graph; the default "source" would clash with the edge's source document
+GRAPH_FILE_KEYS = {"source": "from", "target": "to"}
+
+# Node positions of the last visualization, reused while the graph is unchanged
+GRAPH_LAYOUT_FILE = "graph_layout.pkl"
+
+# spaCy components each task skips. Relation extraction needs the parser, tags
+# and lemmas but not entities; query parsing needs entities and noun chunks
+# (parser and tags) but not lemmas.
+EXTRACTION_DISABLED_PIPES = ["ner"]
+QUERY_DISABLED_PIPES = ["lemmatizer"]
+
+# Dependency labels of a relation's subject and object, and of tokens left out of their phrases
+SUBJECT_DEPS = frozenset({"nsubj", "nsubjpass"})
+OBJECT_DEPS = frozenset({"dobj", "pobj", "attr"})
+SKIPPED_PHRASE_DEPS = frozenset({"punct", "prep"})
+
+# Distinct entity names whose normalized form is remembered
+ENTITY_CACHE_SIZE = 100_000
+
+# Text cleanup patterns for entity extraction
+WHITESPACE_RE = re.compile(r'\s+')
+PUNCTUATION_RE = re.compile(r'[^\w\s]')
+
+# HTML tags, markdown links and JSON keys and punctuation, stripped from a paragraph
+# so the prose inside them is checked and parsed on its own
+HTML_TAG_RE = re.compile(r'<[^>\n]*>')
+MARKDOWN_LINK_RE = re.compile(r'!?\[([^\]\n]*)\]\([^)\n]*\)')
+JSON_KEY_RE = re.compile(r'"[^"\n]*"\s*:\s*')
+JSON_PUNCTUATION_RE = re.compile(r'[{}\[\]"]')
+
+# Paragraphs are only parsed if they read like prose: a sentence of at least three
+# words ending in terminal punctuation (or a bulleted line of words), and few of the
+# characters that make up tables and code
+PARAGRAPH_SPLIT_RE = re.compile(r'\n\s*\n')
+SENTENCE_WORDS = r"[^\W\d_]\w*(?:[ \t,'-]+[^\W_]+(?:\.[^\W_]+)*){2,}"
+SENTENCE_RE = re.compile(
+    SENTENCE_WORDS + r"[^.!?\n]*[.!?](?=\s|$)"
+    r"|^[ \t]*(?:[-*\u2022]|\d+[.)])[ \t]+" + SENTENCE_WORDS,
+    re.MULTILINE,
+)
+MARKUP_RE = re.compile(r'[|{}\[\]<>=;]')
+MAX_MARKUP_RATIO = 0.05
+
+# Relations written to Neo4j per UNWIND query
+NEO4J_BATCH_SIZE = 1000
+
+MERGE_RELATIONS_QUERY = """
+UNWIND $rows AS row
+MERGE (s:Entity {name: row.subject})
+MERGE (o:Entity {name: row.object})
+MERGE (s)-[r:RELATIONSHIP {type: row.predicate}]->(o)
+SET r.sentence = row.sentence, r.source = row.source
+"""
+
+# Up to 5 outgoing and 5 incoming relations of each entity, fetched in one round trip
+ENTITY_FACTS_QUERY = """
+UNWIND $entities AS name
+MATCH (e:Entity {name: name})
+RETURN [(e)-[r:RELATIONSHIP]->(o:Entity) |
+           {subject: e.name, predicate: r.type, object: o.name, sentence: r.sentence, source: r.source}][0..5]
+     + [(s:Entity)-[r:RELATIONSHIP]->(e) |
+           {subject: s.name, predicate: r.type, object: e.name, sentence: r.sentence, source: r.source}][0..5] AS facts
+"""
+
+# spaCy model shared by every KnowledgeGraphService in the process, loaded on first use
+_nlp = None
+_nlp_lock = threading.Lock()
+
+def _get_nlp():
+    """
+    Get the shared spaCy model, loading it on first use
+    
+    All pipes stay enabled; extraction and query parsing each disable what
+    they don't need per call.
+    """
+    global _nlp
+    if _nlp is None:
+        with _nlp_lock:
+            if _nlp is None:
+                # The Streamlit apps and the updater don't run Config.validate(), so install it here too
+                Config.ensure_spacy_model()
+                _nlp = spacy.load(Config.SPACY_MODEL)
+                logger.info("Loaded spaCy model")
+    return _nlp
+
+@functools.lru_cache(maxsize=ENTITY_CACHE_SIZE)
+def _normalize(entity: str) -> str:
+    """Normalize an entity name, interned so repeated entities share one string in the graph"""
+    return sys.intern(entity.strip().lower())
+
+def strip_markup(paragraph: str) -> str:
+    """
+    Strip HTML tags, markdown links and JSON syntax from a paragraph, keeping the text inside them
+    
+    Args:
+        paragraph: Paragraph of raw document text
+        
+    Returns:
+        str: The paragraph's text
+    """
+    paragraph = html.unescape(HTML_TAG_RE.sub(" ", paragraph))
+    paragraph = MARKDOWN_LINK_RE.sub(r"\1", paragraph)
+    return JSON_PUNCTUATION_RE.sub(" ", JSON_KEY_RE.sub(" ", paragraph))
+
+def _is_stripped_prose(text: str) -> bool:
+    """Check whether a paragraph already passed through strip_markup reads like prose"""
+    if not SENTENCE_RE.search(text):
+        return False
+    return len(MARKUP_RE.findall(text)) <= MAX_MARKUP_RATIO * len(text)
+
+def is_prose(paragraph: str) -> bool:
+    """
+    Check whether a paragraph reads like prose, so it could hold a subject-verb-object relation
+    
+    Args:
+        paragraph: Paragraph of raw document text
+        
+    Returns:
+        bool: False for tables, JSON, code and other paragraphs without sentences
+    """
+    return _is_stripped_prose(strip_markup(paragraph))
+
+def graph_visualization_path(filename: str = "knowledge_graph.png") -> Optional[str]:
+    """
+    Path of the saved graph visualization, if it exists and is at least as new as the saved graph
+    
+    Args:
+        filename: Name of the image in the visualizations directory
+        
+    Returns:
+        str: Path of the image, or None if it's missing or stale
+    """
+    filepath = os.path.join(os.getcwd(), "visualizations", filename)
+    if not os.path.exists(filepath):
+        return None
+    if os.path.exists(Config.KNOWLEDGE_GRAPH_FILE) and (
+        os.path.getmtime(filepath) < os.path.getmtime(Config.KNOWLEDGE_GRAPH_FILE)
+    ):
+        return None
+    return filepath
+
 class KnowledgeGraphService:
     """Service for creating and querying a knowledge graph"""
     
     def __init__(self):
         """Initialize the knowledge graph service"""
-        try:
-            # Load spaCy model for NLP tasks
-            self.nlp = spacy.load("en_core_web_sm")
-            logger.info("Loaded spaCy model")
-        except Exception as e:
-            logger.error(f"Failed to load spaCy model: {str(e)}")
-            logger.info("Downloading spaCy model...")
-            os.system("python -m spacy download en_core_web_sm")
-            self.nlp = spacy.load("en_core_web_sm")
+        # spaCy model for NLP tasks, shared with the other service instances
+        self.nlp = _get_nlp()
+            
+        # Dependency label ids, so the extraction loop compares ints instead of label strings
+        strings = self.nlp.vocab.strings
+        self._subject_deps = frozenset(strings.add(label) for label in SUBJECT_DEPS)
+        self._object_deps = frozenset(strings.add(label) for label in OBJECT_DEPS)
+        self._skipped_phrase_deps = frozenset(strings.add(label) for label in SKIPPED_PHRASE_DEPS)
             
         # Connect to Neo4j
         self.graph = None
         self.connected = False
         
-        # Initialize local graph for visualization
+        # Initialize local graph for visualization, starting from the last saved build
         self.local_graph = nx.DiGraph()
+        self._load_local_graph()
+        
+    def _load_local_graph(self):
+        """Load the local graph saved by the last build, if any"""
+        if not os.path.exists(Config.KNOWLEDGE_GRAPH_FILE):
+            return
+        try:
+            with open(Config.KNOWLEDGE_GRAPH_FILE, "r") as f:
+                self.local_graph = nx.node_link_graph(json.load(f), **GRAPH_FILE_KEYS)
+            logger.info(f"Loaded knowledge graph with {len(self.local_graph.nodes)} entities")
+        except Exception as e:
+            logger.error(f"Failed to load knowledge graph: {str(e)}")
+            
+    def _save_local_graph(self):
+        """Save the local graph so later runs can query and update it"""
+        try:
+            tmp_path = f"{Config.KNOWLEDGE_GRAPH_FILE}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(nx.node_link_data(self.local_graph, **GRAPH_FILE_KEYS), f)
+            os.replace(tmp_path, Config.KNOWLEDGE_GRAPH_FILE)
+        except Exception as e:
+            logger.error(f"Failed to save knowledge graph: {str(e)}")
         
     def connect_to_neo4j(self) -> bool:
         """
@@ -46,9 +217,11 @@ class KnowledgeGraphService:
             user = Config.NEO4J_USER
             password = Config.NEO4J_PASSWORD
             
-            self.graph = Graph(uri, auth=(user, password))
+            self.graph = Graph(uri, auth=(user, password), max_connections=Config.NEO4J_MAX_CONNECTIONS)
             # Test connection
             self.graph.run("MATCH (n) RETURN count(n) LIMIT 1")
+            # Index entity names so MERGE and lookups don't scan every node
+            self.graph.run("CREATE INDEX entity_name IF NOT EXISTS FOR (e:Entity) ON (e.name)")
             self.connected = True
             logger.info("Connected to Neo4j database")
             return True
@@ -60,14 +233,17 @@ class KnowledgeGraphService:
             
     def _clean_text(self, text: str) -> str:
         """Clean text for entity extraction"""
-        # Remove special characters and normalize whitespace
-        text = re.sub(r'\s+', ' ', text)
-        text = re.sub(r'[^\w\s]', ' ', text)
-        return text.strip()
+        # Remove special characters, then collapse the whitespace, including the spaces they left
+        return WHITESPACE_RE.sub(' ', PUNCTUATION_RE.sub(' ', text)).strip()
+        
+    def _prose_text(self, text: str) -> str:
+        """Keep only the paragraphs of a text that could hold a relation, with their markup stripped"""
+        paragraphs = (strip_markup(paragraph) for paragraph in PARAGRAPH_SPLIT_RE.split(text))
+        return "\n\n".join(paragraph for paragraph in paragraphs if _is_stripped_prose(paragraph))
         
     def _normalize_entity(self, entity: str) -> str:
         """Normalize entity names"""
-        return entity.strip().lower()
+        return _normalize(entity)
         
     def extract_entities_and_relations(self, text: str) -> List[Dict[str, Any]]:
         """
@@ -80,36 +256,47 @@ class KnowledgeGraphService:
             List of dictionaries containing extracted entity relations
         """
         # Process the text with spaCy
-        doc = self.nlp(self._clean_text(text))
+        doc = self.nlp(self._clean_text(self._prose_text(text)), disable=EXTRACTION_DISABLED_PIPES)
+        return self._relations_from_doc(doc)
+        
+    def _relations_from_doc(self, doc) -> List[Dict[str, Any]]:
+        """
+        Extract subject-verb-object relations from a parsed spaCy Doc
         
+        Args:
+            doc: Doc parsed without EXTRACTION_DISABLED_PIPES
+            
+        Returns:
+            List of dictionaries containing extracted entity relations
+        """
         relations = []
+        subject_deps = self._subject_deps
+        object_deps = self._object_deps
         
         # Extract entities and their relationships based on syntactic dependencies
         for sent in doc.sents:
-            # Find the main verb (root) of the sentence
-            root = None
-            for token in sent:
-                if token.dep_ == "ROOT" and token.pos_ == "VERB":
-                    root = token
-                    break
-                    
-            if not root:
+            # The main verb (root) of the sentence
+            root = sent.root
+            if root.dep_ != "ROOT" or root.pos_ != "VERB":
                 continue
                 
-            # Find subject and object connected to the root verb
+            # Find subject and object connected to the root verb; the last match of each wins
             subject = None
             obj = None
             
             for token in sent:
-                # Find subjects
-                if token.dep_ in ("nsubj", "nsubjpass") and token.head == root:
-                    # Get the complete noun phrase
-                    subject = " ".join([t.text for t in token.subtree if not t.dep_ in ("punct", "prep")])
-                
-                # Find objects
-                if token.dep_ in ("dobj", "pobj", "attr") and (token.head == root or token.head.head == root):
-                    # Get the complete noun phrase
-                    obj = " ".join([t.text for t in token.subtree if not t.dep_ in ("punct", "prep")])
+                dep = token.dep
+                if dep in subject_deps:
+                    # Find subjects
+                    if token.head == root:
+                        # Get the complete noun phrase
+                        subject = self._phrase(token)
+                elif dep in object_deps:
+                    # Find objects
+                    head = token.head
+                    if head == root or head.head == root:
+                        # Get the complete noun phrase
+                        obj = self._phrase(token)
             
             # Create relation if both subject and object are found
             if subject and obj and root:
@@ -123,22 +310,71 @@ class KnowledgeGraphService:
                 
         return relations
         
-    def build_graph_from_documents(self, documents_dir: str = Config.DATA_DIR) -> bool:
+    def _phrase(self, token) -> str:
+        """
+        Text of the phrase headed by a token, without punctuation and prepositions
+        
+        The parse is projective, so the subtree is the contiguous span between the
+        token's left and right edges; its text is sliced straight from the Doc
+        unless some token in it has to be left out.
+        
+        Args:
+            token: Head token of the phrase
+            
+        Returns:
+            str: The phrase
+        """
+        span = token.doc[token.left_edge.i:token.right_edge.i + 1]
+        skipped_deps = self._skipped_phrase_deps
+        if any(t.dep in skipped_deps for t in span):
+            return " ".join([t.text for t in span if t.dep not in skipped_deps])
+        return span.text
+        
+    def _extract_documents(self, documents):
+        """
+        Parse documents in batches with nlp.pipe and extract their relations
+        
+        Each document's source travels through the pipe as its context, so
+        documents can be a one-shot iterator and are consumed as they're parsed.
+        
+        Args:
+            documents: Documents to process
+            
+        Yields:
+            tuple: (source, relations)
+        """
+        pairs = (
+            (self._clean_text(self._prose_text(document.text)), document.metadata.get('source', 'unknown'))
+            for document in documents
+        )
+        for doc, source in self.nlp.pipe(
+            pairs,
+            as_tuples=True,
+            batch_size=Config.SPACY_BATCH_SIZE,
+            n_process=Config.SPACY_N_PROCESS,
+            disable=EXTRACTION_DISABLED_PIPES,
+        ):
+            yield source, self._relations_from_doc(doc)
+            
+    def build_graph_from_documents(self, documents_dir: str = Config.DATA_DIR, visualize: bool = False) -> bool:
         """
         Build a knowledge graph from documents
         
         Args:
             documents_dir: Directory containing documents
+            visualize: Also render the graph visualization
             
         Returns:
             bool: True if successful, False otherwise
         """
-        # Load documents
-        documents = load_documents_from_directory(documents_dir)
+        # Stream documents, so each one is only held in memory while it's parsed
+        documents = iter_documents_from_directory(documents_dir)
+        first_document = next(documents, None)
         
-        if not documents:
+        if first_document is None:
             logger.error(f"No documents found in {documents_dir}")
             return False
+        documents = itertools.chain([first_document], documents)
             
         # Reset graph
         self.local_graph = nx.DiGraph()
@@ -150,57 +386,199 @@ class KnowledgeGraphService:
             # Clear existing graph
             self.graph.run("MATCH (n) DETACH DELETE n")
             
-        total_relations = 0
+        total_relations = self._add_documents(documents, neo4j_available)
+                    
+        logger.info(f"Added {total_relations} relations to knowledge graph")
+        self._save_local_graph()
+        
+        # Save visualization
+        if visualize and len(self.local_graph.nodes) > 0:
+            self._save_graph_visualization()
+            
+        return True
         
-        # Process each document
-        for document in documents:
-            text = document.text
-            metadata = document.metadata
-            source = metadata.get('source', 'unknown')
+    def graph_sources(self) -> set:
+        """Sources of the documents the local graph's relations were extracted from"""
+        return {data.get('source', 'unknown') for _, _, data in self.local_graph.edges(data=True)}
+        
+    def incremental_update(self, changed_paths: List[str], removed_sources: Optional[List[str]] = None,
+                           visualize: bool = False) -> bool:
+        """
+        Re-extract relations only for changed documents and merge them into the existing graph
+        
+        Relations previously extracted from these documents are removed first,
+        so edited documents don't leave stale facts behind; relations from
+        removed documents are just dropped.
+        
+        Args:
+            changed_paths: Paths of the new or changed documents
+            removed_sources: Sources of documents that were deleted or renamed
+            visualize: Also render the graph visualization
             
-            logger.info(f"Extracting entities and relations from {source}")
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        documents = load_documents_from_files(changed_paths)
+        removed_sources = list(removed_sources or [])
+        if not documents and not removed_sources:
+            logger.info("No changed documents to add to the knowledge graph")
+            return True
             
-            # Extract entities and relations
-            relations = self.extract_entities_and_relations(text)
+        sources = [document.metadata.get('source', 'unknown') for document in documents] + removed_sources
+        source_set = set(sources)
+        
+        # Drop relations extracted from the previous versions of the documents, or from removed ones
+        stale_edges = [
+            (u, v) for u, v, data in self.local_graph.edges(data=True)
+            if data.get('source') in source_set
+        ]
+        self.local_graph.remove_edges_from(stale_edges)
+        self.local_graph.remove_nodes_from(list(nx.isolates(self.local_graph)))
+        
+        neo4j_available = self.connect_to_neo4j()
+        if neo4j_available:
+            self.graph.run(
+                "MATCH ()-[r:RELATIONSHIP]->() WHERE r.source IN $sources DELETE r",
+                sources=sources,
+            )
+            self.graph.run("MATCH (n:Entity) WHERE NOT (n)--() DELETE n")
             
-            logger.info(f"Extracted {len(relations)} relations from {source}")
-            total_relations += len(relations)
+        total_relations = self._add_documents(documents, neo4j_available)
             
-            # Add to graph
-            for relation in relations:
-                subject = relation['subject']
-                predicate = relation['predicate']
-                obj = relation['object']
-                sentence = relation['sentence']
-                
-                # Add to local graph
-                if subject not in self.local_graph:
-                    self.local_graph.add_node(subject, type='entity')
-                if obj not in self.local_graph:
-                    self.local_graph.add_node(obj, type='entity')
-                    
-                self.local_graph.add_edge(subject, obj, relationship=predicate, sentence=sentence, source=source)
-                
-                # Add to Neo4j if available
-                if neo4j_available:
-                    query = """
-                    MERGE (s:Entity {name: $subject})
-                    MERGE (o:Entity {name: $object})
-                    MERGE (s)-[r:RELATIONSHIP {type: $predicate}]->(o)
-                    SET r.sentence = $sentence, r.source = $source
-                    """
-                    self.graph.run(query, subject=subject, object=obj, predicate=predicate, sentence=sentence, source=source)
-                    
-        logger.info(f"Added {total_relations} relations to knowledge graph")
+        logger.info(
+            f"Updated knowledge graph from {len(documents)} changed documents ({total_relations} relations)"
+            f" and {len(removed_sources)} removed documents"
+        )
+        self._save_local_graph()
         
-        # Save visualization
-        if len(self.local_graph.nodes) > 0:
+        if visualize and len(self.local_graph.nodes) > 0:
             self._save_graph_visualization()
             
         return True
         
-    def _save_graph_visualization(self, filename: str = "knowledge_graph.png"):
-        """Save visualization of the graph"""
+    def _add_documents(self, documents, neo4j_available: bool) -> int:
+        """
+        Extract relations from documents and add them to the local graph (and Neo4j if available)
+        
+        Neo4j rows are sent in UNWIND batches of NEO4J_BATCH_SIZE, gathered across
+        documents, inside a single transaction that's committed once at the end.
+        
+        Args:
+            documents: Documents to process
+            neo4j_available: Whether to also write to Neo4j
+            
+        Returns:
+            int: Number of relations added
+        """
+        tx = self.graph.begin() if neo4j_available else None
+        rows = [] if neo4j_available else None
+        total_relations = 0
+        try:
+            # Process the documents in spaCy batches
+            for source, relations in self._extract_documents(documents):
+                total_relations += self._add_document_relations(source, relations, rows)
+                while tx is not None and len(rows) >= NEO4J_BATCH_SIZE:
+                    tx.run(MERGE_RELATIONS_QUERY, rows=rows[:NEO4J_BATCH_SIZE])
+                    del rows[:NEO4J_BATCH_SIZE]
+                    
+            if tx is not None:
+                if rows:
+                    tx.run(MERGE_RELATIONS_QUERY, rows=rows)
+                self.graph.commit(tx)
+        except Exception:
+            if tx is not None:
+                self.graph.rollback(tx)
+            raise
+            
+        return total_relations
+        
+    def _add_document_relations(self, source: str, relations: List[Dict[str, Any]],
+                                rows: Optional[List[Dict[str, Any]]] = None) -> int:
+        """
+        Add a document's relations to the local graph, collecting their Neo4j rows
+        
+        Args:
+            source: Source of the document the relations were extracted from
+            relations: Relations extracted from the document
+            rows: List the Neo4j rows are appended to, or None if Neo4j isn't used
+            
+        Returns:
+            int: Number of relations added
+        """
+        logger.info(f"Extracted {len(relations)} relations from {source}")
+        
+        # Add to graph
+        edges = []
+        for relation in relations:
+            edges.append((relation['subject'], relation['object'], {
+                "relationship": relation['predicate'],
+                "sentence": relation['sentence'],
+                "source": source,
+            }))
+            if rows is not None:
+                rows.append({**relation, "source": source})
+                
+        # Add to local graph in bulk; entities keep their 'entity' type
+        self.local_graph.add_nodes_from((entity for subject, obj, _ in edges for entity in (subject, obj)), type='entity')
+        self.local_graph.add_edges_from(edges)
+                
+        return len(relations)
+        
+    def get_graph_visualization(self, filename: str = "knowledge_graph.png") -> Optional[str]:
+        """
+        Get the graph visualization, rendering it only if it's missing or older than the saved graph
+        
+        Args:
+            filename: Name of the image in the visualizations directory
+            
+        Returns:
+            str: Path of the image, or None if the graph is empty or rendering failed
+        """
+        filepath = graph_visualization_path(filename)
+        if filepath:
+            return filepath
+        if len(self.local_graph.nodes) == 0:
+            return None
+        return self._save_graph_visualization(filename)
+        
+    def _graph_layout(self, viz_dir: str) -> Dict[str, Any]:
+        """
+        Compute node positions for the visualization, reusing the saved ones if the graph is unchanged
+        
+        Args:
+            viz_dir: Visualizations directory, where the positions are saved
+            
+        Returns:
+            Dict mapping each node to its position
+        """
+        digest = hashlib.sha1()
+        for node in sorted(self.local_graph.nodes):
+            digest.update(f"n{node}\0".encode())
+        for u, v in sorted(self.local_graph.edges):
+            digest.update(f"e{u}\0{v}\0".encode())
+        graph_key = digest.hexdigest()
+        
+        layout_path = os.path.join(viz_dir, GRAPH_LAYOUT_FILE)
+        try:
+            with open(layout_path, "rb") as f:
+                saved_key, pos = pickle.load(f)
+            if saved_key == graph_key:
+                return pos
+        except Exception:
+            pass
+            
+        # Fruchterman-Reingold is quadratic in the node count per iteration
+        if len(self.local_graph) > Config.GRAPH_LAYOUT_FAST_NODES:
+            pos = nx.spring_layout(self.local_graph, iterations=20, seed=0)
+        else:
+            pos = nx.spring_layout(self.local_graph, seed=0)
+            
+        with open(layout_path, "wb") as f:
+            pickle.dump((graph_key, pos), f)
+        return pos
+        
+    def _save_graph_visualization(self, filename: str = "knowledge_graph.png") -> Optional[str]:
+        """Save visualization of the graph, returning its path (None if it failed)"""
         try:
             # Create visualization directory if it doesn't exist
             viz_dir = os.path.join(os.getcwd(), "visualizations")
@@ -211,7 +589,7 @@ class KnowledgeGraphService:
             
             # Plot the graph
             plt.figure(figsize=(12, 10))
-            pos = nx.spring_layout(self.local_graph)
+            pos = self._graph_layout(viz_dir)
             nx.draw_networkx_nodes(self.local_graph, pos, node_size=500)
             nx.draw_networkx_edges(self.local_graph, pos, width=1, alpha=0.7)
             nx.draw_networkx_labels(self.local_graph, pos, font_size=10)
@@ -226,8 +604,10 @@ class KnowledgeGraphService:
             plt.close()
             
             logger.info(f"Saved graph visualization to {filepath}")
+            return filepath
         except Exception as e:
             logger.error(f"Failed to save graph visualization: {str(e)}")
+            return None
             
     def query_graph(self, query: str) -> Dict[str, Any]:
         """
@@ -240,7 +620,7 @@ class KnowledgeGraphService:
             Dict containing answer and source information
         """
         # Extract entities from the query
-        doc = self.nlp(query)
+        doc = self.nlp(query, disable=QUERY_DISABLED_PIPES)
         entities = [ent.text.lower() for ent in doc.ents]
         
         # Also look for noun chunks as potential entities
@@ -258,25 +638,10 @@ class KnowledgeGraphService:
         facts = []
         
         if self.connected and self.graph:
-            # Search in Neo4j
-            for entity in all_entities:
-                # Query for relationships where the entity is the subject
-                query = """
-                MATCH (s:Entity {name: $entity})-[r:RELATIONSHIP]->(o:Entity)
-                RETURN s.name as subject, r.type as predicate, o.name as object, r.sentence as sentence, r.source as source
-                LIMIT 5
-                """
-                results = self.graph.run(query, entity=entity).data()
-                facts.extend(results)
-                
-                # Query for relationships where the entity is the object
-                query = """
-                MATCH (s:Entity)-[r:RELATIONSHIP]->(o:Entity {name: $entity})
-                RETURN s.name as subject, r.type as predicate, o.name as object, r.sentence as sentence, r.source as source
-                LIMIT 5
-                """
-                results = self.graph.run(query, entity=entity).data()
-                facts.extend(results)
+            # Search in Neo4j, all entities in one query
+            results = self.graph.run(ENTITY_FACTS_QUERY, entities=list(all_entities)).data()
+            for row in results:
+                facts.extend(row['facts'])
         else:
             # Search in local graph
             for entity in all_entities:
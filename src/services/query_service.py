@@ -1,5 +1,10 @@
+import asyncio
 import logging
-from typing import Dict, List, Any, Optional
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError
+from typing import Awaitable, Callable, Dict, List, Any, Iterator, Optional
 
 from llama_index.core import VectorStoreIndex
 from llama_index.core.response_synthesizers import get_response_synthesizer
@@ -9,6 +14,79 @@ from src.utils.config import Config
 
 logger = logging.getLogger(__name__)
 
+# Called before a timed out query call is retried, with the retry number and the delay before it
+RetryCallback = Callable[[int, float], None]
+
+def _start_call(fn: Callable[[], Any]) -> Future:
+    """Run fn on a daemon thread of its own, returning a future of its result"""
+    future = Future()
+    
+    def run():
+        try:
+            future.set_result(fn())
+        except BaseException as e:
+            future.set_exception(e)
+            
+    threading.Thread(target=run, name="query", daemon=True).start()
+    return future
+
+def call_with_timeout(fn: Callable[[], Any], on_retry: Optional[RetryCallback] = None) -> Any:
+    """
+    Call fn, giving up after Config.QUERY_TIMEOUT_S and retrying with exponential backoff
+    
+    A running call can't be cancelled, so a timed out attempt keeps running until it
+    returns (the LLM clients' own timeout bounds how long). Each attempt gets a thread
+    of its own, so abandoned attempts never hold up later queries the way they would
+    in a shared pool.
+    
+    Args:
+        fn: Function to call, without arguments
+        on_retry: Called before each retry, e.g. to show that the answer is delayed
+        
+    Returns:
+        The function's result
+        
+    Raises:
+        TimeoutError: If every attempt timed out
+    """
+    for attempt in range(Config.QUERY_RETRIES + 1):
+        future = _start_call(fn)
+        try:
+            return future.result(timeout=Config.QUERY_TIMEOUT_S)
+        except TimeoutError:
+            if attempt == Config.QUERY_RETRIES:
+                raise
+            delay = Config.QUERY_RETRY_BACKOFF_S * 2 ** attempt
+            logger.warning(f"Query timed out after {Config.QUERY_TIMEOUT_S}s, retrying in {delay}s...")
+            if on_retry:
+                on_retry(attempt + 1, delay)
+            time.sleep(delay)
+
+async def acall_with_timeout(fn: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Async counterpart of call_with_timeout: await fn(), retrying timed out attempts
+    
+    Unlike a thread, a timed out awaitable is cancelled, so nothing is left running.
+    
+    Args:
+        fn: Function returning the awaitable to wait for, without arguments
+        
+    Returns:
+        The awaitable's result
+        
+    Raises:
+        TimeoutError: If every attempt timed out
+    """
+    for attempt in range(Config.QUERY_RETRIES + 1):
+        try:
+            return await asyncio.wait_for(fn(), timeout=Config.QUERY_TIMEOUT_S)
+        except asyncio.TimeoutError:
+            if attempt == Config.QUERY_RETRIES:
+                raise TimeoutError()
+            delay = Config.QUERY_RETRY_BACKOFF_S * 2 ** attempt
+            logger.warning(f"Query timed out after {Config.QUERY_TIMEOUT_S}s, retrying in {delay}s...")
+            await asyncio.sleep(delay)
+
 class QueryService:
     def __init__(self, index: Optional[VectorStoreIndex] = None):
         """
@@ -18,59 +96,220 @@ class QueryService:
             index: VectorStoreIndex to query against
         """
         self.index = index
-        self.llm = OpenAI(model=Config.DEFAULT_LLM_MODEL, api_key=Config.OPENAI_API_KEY)
+        # The timeout also bounds the wait between streamed tokens
+        self.llm = OpenAI(model=Config.DEFAULT_LLM_MODEL, api_key=Config.OPENAI_API_KEY, timeout=Config.QUERY_TIMEOUT_S)
+        
+        # Synthesizers don't depend on the index, so one per streaming mode is shared by all engines
+        self._synthesizers = {
+            streaming: get_response_synthesizer(response_mode="compact", llm=self.llm, streaming=streaming)
+            for streaming in (False, True)
+        }
+        
+        # Least recently used query engines for the current index, keyed by (similarity_top_k, streaming)
+        self._query_engines = OrderedDict()
+        self._query_engines_lock = threading.Lock()
         
     def set_index(self, index: VectorStoreIndex):
         """Set the index to query against"""
         self.index = index
+        with self._query_engines_lock:
+            self._query_engines.clear()
         
-    def query(self, query_text: str, similarity_top_k: int = 5) -> Dict[str, Any]:
+    def _engine_for(self, similarity_top_k: int, streaming: bool = False):
+        """
+        Get a query engine for the current index, building it on first use
+        
+        Up to Config.QUERY_ENGINE_CACHE_SIZE engines are kept; the least
+        recently used one is dropped first.
+        
+        Args:
+            similarity_top_k: Number of similar chunks to retrieve
+            streaming: Whether the engine streams its answers
+            
+        Returns:
+            Query engine over the current index
+        """
+        key = (similarity_top_k, streaming)
+        with self._query_engines_lock:
+            query_engine = self._query_engines.get(key)
+            if query_engine is None:
+                query_engine = self.index.as_query_engine(
+                    similarity_top_k=similarity_top_k,
+                    response_synthesizer=self._synthesizers[streaming],
+                )
+                self._query_engines[key] = query_engine
+                if len(self._query_engines) > Config.QUERY_ENGINE_CACHE_SIZE:
+                    self._query_engines.popitem(last=False)
+            self._query_engines.move_to_end(key)
+        return query_engine
+        
+    def query(self, query_text: str, similarity_top_k: int = 5,
+              on_retry: Optional[RetryCallback] = None) -> Dict[str, Any]:
         """
         Query the index with a natural language query
         
         Args:
             query_text: The query text
             similarity_top_k: Number of similar chunks to retrieve
+            on_retry: Called before a timed out query is retried
             
         Returns:
-            Dict containing response and source nodes
+            Dict containing response and source nodes, and "error": True if the query failed
         """
         if not self.index:
             logger.error("No index available for querying")
-            return {"answer": "Sorry, the knowledge base is not loaded. Please build the index first.", "sources": []}
+            return {"answer": "Sorry, the knowledge base is not loaded. Please build the index first.", "sources": [], "error": True}
         
         try:
-            # Create query engine
-            query_engine = self.index.as_query_engine(
-                similarity_top_k=similarity_top_k,
-                response_synthesizer=get_response_synthesizer(
-                    response_mode="compact",
-                    llm=self.llm,
-                )
-            )
-            
             # Execute query
-            response = query_engine.query(query_text)
-            
-            # Extract source information
-            sources = []
-            if hasattr(response, 'source_nodes'):
-                for node in response.source_nodes:
-                    source = {
-                        "text": node.node.get_content(),
-                        "metadata": node.node.metadata,
-                        "score": node.score if hasattr(node, 'score') else None
-                    }
-                    sources.append(source)
+            response = call_with_timeout(lambda: self._engine_for(similarity_top_k).query(query_text), on_retry)
                     
             return {
                 "answer": str(response),
-                "sources": sources
+                "sources": self._extract_sources(response)
             }
             
+        except TimeoutError:
+            logger.error(f"Query timed out after {Config.QUERY_RETRIES + 1} attempts")
+            return {
+                "answer": "Sorry, the answer is taking too long. Please try again.",
+                "sources": [],
+                "error": True
+            }
         except Exception as e:
             logger.error(f"Error during query: {str(e)}")
             return {
                 "answer": f"An error occurred while processing your query: {str(e)}",
-                "sources": []
+                "sources": [],
+                "error": True
             }
+            
+    async def aquery(self, query_text: str, similarity_top_k: int = 5) -> Dict[str, Any]:
+        """
+        Query the index without blocking the event loop during retrieval and the LLM call
+        
+        Args:
+            query_text: The query text
+            similarity_top_k: Number of similar chunks to retrieve
+            
+        Returns:
+            Dict containing response and source nodes, and "error": True if the query failed
+        """
+        if not self.index:
+            logger.error("No index available for querying")
+            return {"answer": "Sorry, the knowledge base is not loaded. Please build the index first.", "sources": [], "error": True}
+        
+        try:
+            query_engine = self._engine_for(similarity_top_k)
+            response = await acall_with_timeout(lambda: query_engine.aquery(query_text))
+            
+            return {
+                "answer": str(response),
+                "sources": self._extract_sources(response)
+            }
+            
+        except TimeoutError:
+            logger.error(f"Query timed out after {Config.QUERY_RETRIES + 1} attempts")
+            return {
+                "answer": "Sorry, the answer is taking too long. Please try again.",
+                "sources": [],
+                "error": True
+            }
+        except Exception as e:
+            logger.error(f"Error during query: {str(e)}")
+            return {
+                "answer": f"An error occurred while processing your query: {str(e)}",
+                "sources": [],
+                "error": True
+            }
+            
+    async def aquery_many(self, queries: List[str], similarity_top_k: int = 5) -> List[Dict[str, Any]]:
+        """
+        Answer several queries concurrently, at most Config.QUERY_MAX_CONCURRENCY at a time
+        
+        Args:
+            queries: The query texts
+            similarity_top_k: Number of similar chunks to retrieve per query
+            
+        Returns:
+            List of aquery results, in the order of the queries
+        """
+        semaphore = asyncio.Semaphore(Config.QUERY_MAX_CONCURRENCY)
+        
+        async def bounded_query(query_text: str) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.aquery(query_text, similarity_top_k)
+                
+        return await asyncio.gather(*(bounded_query(query_text) for query_text in queries))
+            
+    def query_stream(self, query_text: str, result: Dict[str, Any], similarity_top_k: int = 5,
+                     on_retry: Optional[RetryCallback] = None) -> Iterator[str]:
+        """
+        Query the index, yielding the answer as the LLM generates it
+        
+        Args:
+            query_text: The query text
+            result: Dict filled with "sources" once retrieval is done and with
+                the full "answer" once the stream is exhausted; "error" is set
+                to True if the query failed
+            similarity_top_k: Number of similar chunks to retrieve
+            on_retry: Called before a timed out query is retried
+            
+        Yields:
+            str: Answer tokens
+        """
+        result["sources"] = []
+        if not self.index:
+            logger.error("No index available for querying")
+            result["answer"] = "Sorry, the knowledge base is not loaded. Please build the index first."
+            result["error"] = True
+            yield result["answer"]
+            return
+            
+        tokens = []
+        try:
+            query_engine = self._engine_for(similarity_top_k, streaming=True)
+            
+            # Retrieval happens here; the answer is generated as the stream is consumed
+            response = call_with_timeout(lambda: query_engine.query(query_text), on_retry)
+            result["sources"] = self._extract_sources(response)
+            
+            for token in response.response_gen:
+                tokens.append(token)
+                yield token
+                
+        except TimeoutError:
+            logger.error(f"Query timed out after {Config.QUERY_RETRIES + 1} attempts")
+            error = "Sorry, the answer is taking too long. Please try again."
+            result["error"] = True
+            tokens.append(error)
+            yield error
+        except Exception as e:
+            logger.error(f"Error during query: {str(e)}")
+            error = f"An error occurred while processing your query: {str(e)}"
+            result["error"] = True
+            tokens.append(error)
+            yield error
+            
+        result["answer"] = "".join(tokens)
+        
+    def _extract_sources(self, response) -> List[Dict[str, Any]]:
+        """
+        Extract source information from a query engine response
+        
+        Args:
+            response: Response returned by the query engine
+            
+        Returns:
+            List of dicts with the text, metadata and score of each source node
+        """
+        sources = []
+        if hasattr(response, 'source_nodes'):
+            for node in response.source_nodes:
+                source = {
+                    "text": node.node.get_content(),
+                    "metadata": node.node.metadata,
+                    "score": node.score if hasattr(node, 'score') else None
+                }
+                sources.append(source)
+        return sources
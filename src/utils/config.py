@@ -1,3 +1,4 @@
+import importlib.util
 import os
 from dotenv import load_dotenv
 import logging
@@ -21,17 +22,71 @@ class Config:
     
     # Storage settings
     CHROMA_DB_DIRECTORY = os.getenv("CHROMA_DB_DIRECTORY", "./chroma_db")
+    FAISS_INDEX_DIRECTORY = os.getenv("FAISS_INDEX_DIRECTORY", "./faiss_index")
+    
+    # Vector store backend: "chroma" or "faiss"
+    VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma").lower()
+    
+    # FAISS settings: exact search up to FAISS_FLAT_MAX_VECTORS, IVF-PQ above with
+    # about 4*sqrt(n) inverted lists, trained on up to FAISS_TRAIN_POINTS_PER_LIST points per list
+    FAISS_FLAT_MAX_VECTORS = 100_000
+    FAISS_PQ_ENCODING = "PQ64"
+    FAISS_TRAIN_POINTS_PER_LIST = 256
+    FAISS_NPROBE = 32
     DATA_DIR = os.getenv("DATA_DIR", "./data")
     
+    # Local knowledge graph, saved so it can be updated incrementally
+    KNOWLEDGE_GRAPH_FILE = os.getenv("KNOWLEDGE_GRAPH_FILE", "./knowledge_graph.json")
+    
+    # Graphs with more entities than this get a cheaper (fewer iterations) layout when visualized
+    GRAPH_LAYOUT_FAST_NODES = 200
+    
+    # spaCy batching for knowledge graph extraction; more than one process forks a model copy per worker
+    SPACY_MODEL = "en_core_web_sm"
+    SPACY_BATCH_SIZE = 64
+    SPACY_N_PROCESS = int(os.getenv("SPACY_N_PROCESS", "1"))
+    
     # Optional Neo4j settings for Phase 2
     NEO4J_URI = os.getenv("NEO4J_URI", "bolt://localhost:7687")
     NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
     NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "password")
+    NEO4J_MAX_CONNECTIONS = int(os.getenv("NEO4J_MAX_CONNECTIONS", "40"))
     
     # Chunking settings
     CHUNK_SIZE = 1000
     CHUNK_OVERLAP = 200
     
+    # Embedding settings
+    EMBED_MODEL = os.getenv("EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+    EMBED_BATCH_SIZE = 64
+    
+    # Number of chunks embedded and added to Chroma per batch
+    INSERT_BATCH_SIZE = 512
+    
+    # Seconds before a query's LLM call is abandoned, and retries with exponential backoff
+    QUERY_TIMEOUT_S = 15
+    QUERY_RETRIES = 2
+    QUERY_RETRY_BACKOFF_S = 1
+    
+    # Queries answered at once by QueryService.aquery_many
+    QUERY_MAX_CONCURRENCY = 8
+    
+    # Query engines (one per similarity_top_k and streaming mode) kept by a QueryService
+    QUERY_ENGINE_CACHE_SIZE = 8
+    
+    # Responses to recent queries kept by the hybrid query service
+    QUERY_CACHE_SIZE = 256
+    
+    # Similarity below which a vector search source doesn't count as context for a single graph fact
+    DIRECT_ANSWER_MIN_SCORE = 0.5
+    
+    @classmethod
+    def index_directory(cls):
+        """Directory holding the vector index for the configured backend"""
+        if cls.VECTOR_BACKEND == "faiss":
+            return cls.FAISS_INDEX_DIRECTORY
+        return cls.CHROMA_DB_DIRECTORY
+        
     @classmethod
     def validate(cls):
         """Validate required configuration"""
@@ -43,4 +98,20 @@ class Config:
             logger.warning(f"Data directory {cls.DATA_DIR} does not exist. Creating it...")
             os.makedirs(cls.DATA_DIR)
             
+        return cls.ensure_spacy_model()
+        
+    @classmethod
+    def ensure_spacy_model(cls):
+        """Download the spaCy model in-process if it isn't installed; returns False if that failed"""
+        if importlib.util.find_spec(cls.SPACY_MODEL) is not None:
+            return True
+            
+        logger.warning(f"spaCy model {cls.SPACY_MODEL} is not installed. Downloading it...")
+        try:
+            from spacy.cli import download
+            download(cls.SPACY_MODEL)
+        except (Exception, SystemExit) as e:
+            logger.error(f"Failed to download spaCy model {cls.SPACY_MODEL}: {str(e)}")
+            return False
+        importlib.invalidate_caches()
         return True
@@ -1,57 +1,156 @@
 import os
-from typing import List, Dict, Any
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, List, Dict, Any, Optional
 import logging
 from llama_index.core import Document
 
 logger = logging.getLogger(__name__)
 
-def load_documents_from_directory(directory_path: str) -> List[Document]:
+# Extensions of files loaded as text documents
+TEXT_EXTENSIONS = frozenset({'.txt', '.md', '.html', '.csv', '.json'})
+
+# Threads reading files; reads release the GIL, so this overlaps disk latency
+READ_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+# Files read ahead of the consumer when streaming documents
+READ_AHEAD = READ_WORKERS * 2
+
+def is_nonempty_dir(directory_path: str) -> bool:
     """
-    Load documents from a directory of text files
+    Check whether a directory has any entries, without listing all of them
     
     Args:
-        directory_path: Path to the directory containing text files
+        directory_path: Path to the directory
         
     Returns:
-        List of Document objects
+        bool: True if the directory contains at least one entry
     """
-    documents = []
-    
-    if not os.path.exists(directory_path):
-        logger.warning(f"Directory {directory_path} does not exist.")
-        return documents
+    with os.scandir(directory_path) as entries:
+        return next(entries, None) is not None
+
+def _read_document(file_path: str) -> Optional[Document]:
+    """
+    Read a text file as a document
     
-    for filename in os.listdir(directory_path):
-        file_path = os.path.join(directory_path, filename)
+    Args:
+        file_path: Path of the file
         
-        # Skip directories and non-text files
-        if os.path.isdir(file_path):
-            continue
+    Returns:
+        Document, or None if the file couldn't be read
+    """
+    filename = os.path.basename(file_path)
+    try:
+        # Read the whole file unbuffered, sized from fstat
+        fd = os.open(file_path, os.O_RDONLY)
+        try:
+            chunks = []
+            remaining = os.fstat(fd).st_size
+            while True:
+                chunk = os.read(fd, max(remaining, 1 << 16))
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                remaining -= len(chunk)
+        finally:
+            os.close(fd)
             
-        # Check if file is likely a text file
-        if not filename.lower().endswith(('.txt', '.md', '.html', '.csv', '.json')):
-            logger.info(f"Skipping non-text file: {filename}")
-            continue
+        # Undecodable bytes become U+FFFD instead of failing the whole file
+        content = b"".join(chunks).decode('utf-8', errors='replace')
             
-        try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                content = file.read()
-                
-                # Create metadata
-                metadata = {
-                    "source": filename,
-                    "file_path": file_path,
-                    "file_type": os.path.splitext(filename)[1],
-                }
-                
-                # Create document
-                document = Document(text=content, metadata=metadata)
-                documents.append(document)
+        # Create metadata
+        metadata = {
+            "source": filename,
+            "file_path": file_path,
+            "file_type": os.path.splitext(filename)[1],
+        }
+        
+        logger.info(f"Loaded document: {filename}")
+        return Document(text=content, metadata=metadata)
+        
+    except Exception as e:
+        logger.error(f"Error loading file {filename}: {str(e)}")
+        return None
+
+def _iter_documents(file_paths: Iterable[str]) -> Iterator[Document]:
+    """
+    Read text files in parallel, yielding them in order and skipping files that fail
+    
+    At most READ_AHEAD files are read ahead of the consumer, so a slow consumer
+    doesn't end up with the whole corpus in memory.
+    """
+    with ThreadPoolExecutor(max_workers=READ_WORKERS) as executor:
+        pending = deque()
+        for file_path in file_paths:
+            pending.append(executor.submit(_read_document, file_path))
+            if len(pending) >= READ_AHEAD:
+                document = pending.popleft().result()
+                if document is not None:
+                    yield document
+        while pending:
+            document = pending.popleft().result()
+            if document is not None:
+                yield document
+
+def _read_documents(file_paths: List[str]) -> List[Document]:
+    """Read text files in parallel, keeping their order and skipping files that fail"""
+    return list(_iter_documents(file_paths))
+
+def load_documents_from_files(file_paths: List[str]) -> List[Document]:
+    """
+    Load specific text files as documents
+    
+    Args:
+        file_paths: Paths of the files to load
+        
+    Returns:
+        List of Document objects
+    """
+    return _read_documents(file_paths)
+
+def _text_file_paths(directory_path: str) -> Iterator[str]:
+    """Yield the paths of the text files in a directory"""
+    with os.scandir(directory_path) as entries:
+        for entry in entries:
+            # Skip directories and non-text files; the entry caches its type from the directory listing
+            if not entry.is_file():
+                continue
                 
-                logger.info(f"Loaded document: {filename}")
+            # Check if file is likely a text file
+            name = entry.name
+            dot = name.rfind('.')
+            if dot < 0 or name[dot:].lower() not in TEXT_EXTENSIONS:
+                logger.info(f"Skipping non-text file: {name}")
+                continue
                 
-        except Exception as e:
-            logger.error(f"Error loading file {filename}: {str(e)}")
-            
+            yield entry.path
+
+def iter_documents_from_directory(directory_path: str) -> Iterator[Document]:
+    """
+    Stream documents from a directory of text files, one per file
+    
+    Args:
+        directory_path: Path to the directory containing text files
+        
+    Yields:
+        Document: The next document
+    """
+    if not os.path.exists(directory_path):
+        logger.warning(f"Directory {directory_path} does not exist.")
+        return
+        
+    yield from _iter_documents(_text_file_paths(directory_path))
+
+def load_documents_from_directory(directory_path: str) -> List[Document]:
+    """
+    Load documents from a directory of text files
+    
+    Args:
+        directory_path: Path to the directory containing text files
+        
+    Returns:
+        List of Document objects
+    """
+    documents = list(iter_documents_from_directory(directory_path))
     logger.info(f"Loaded {len(documents)} documents from {directory_path}")
     return documents
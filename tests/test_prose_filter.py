@@ -0,0 +1,32 @@
+import pytest
+
+pytest.importorskip("spacy")
+pytest.importorskip("py2neo")
+
+from src.services.knowledge_graph_service import is_prose
+
+
+@pytest.mark.parametrize("paragraph", [
+    "Marie Curie discovered radium in 1898.",
+    "The chatbot uses LlamaIndex to create embeddings of your content and stores them in a vector database.",
+    "### What technologies are used?\n- ChromaDB is the vector database\n- Streamlit serves the web interface",
+    "Yes, you can deploy this chatbot to production (Phase 2 adds authentication).",
+    "<p>Marie Curie discovered radium in 1898.</p>",
+    '{"answer": "The warranty covers all parts for two years."}',
+    "The warranty covers parts (see [docs](http://x.com/a)).",
+    "Python 3.11 is required.",
+])
+def test_prose_is_kept(paragraph):
+    assert is_prose(paragraph)
+
+
+@pytest.mark.parametrize("paragraph", [
+    "| Name | Age | City |\n|------|-----|------|\n| Alice | 30 | Paris |",
+    '{"name": "alice", "type": "person", "city": "paris"}',
+    "def build(self):\n    for doc in docs:\n        index = self.add(doc)\n    return index",
+    "for (int i = 0; i < n; i++) { total += values[i]; }",
+    "1, 2, 3\n4, 5, 6",
+    "## Technical Questions",
+])
+def test_non_prose_is_skipped(paragraph):
+    assert not is_prose(paragraph)